@@ -0,0 +1,87 @@
+from functools import reduce
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# A user's week is packed into one int: bit (day_index * 24 + hour) is set when
+# the user is free for the hour starting at `hour` on that day.
+WEEKDAYS = [
+    "monday", "tuesday", "wednesday", "thursday",
+    "friday", "saturday", "sunday",
+]
+HOURS_PER_DAY = 24
+WEEK_SLOTS = len(WEEKDAYS) * HOURS_PER_DAY  # 168
+WEEK_BYTES = WEEK_SLOTS // 8  # 21
+FULL_WEEK = (1 << WEEK_SLOTS) - 1
+DAY_MASK = (1 << HOURS_PER_DAY) - 1
+
+
+def to_week_mask(avails: dict) -> int:
+    """
+    {day -> [hours]} to a 168-bit week mask. Unknown days and hours outside 0-23 are ignored.
+    """
+    mask = 0
+    if not avails:
+        return mask
+    for day_index, day in enumerate(WEEKDAYS):
+        offset = day_index * HOURS_PER_DAY
+        for h in avails.get(day, []) or []:
+            if isinstance(h, int) and 0 <= h < HOURS_PER_DAY:
+                mask |= 1 << (offset + h)
+    return mask
+
+
+def from_week_mask(mask: int) -> Dict[str, List[int]]:
+    """
+    168-bit week mask back to {day -> sorted [hours]}
+    """
+    out = {}
+    for day_index, day in enumerate(WEEKDAYS):
+        day_bits = (mask >> (day_index * HOURS_PER_DAY)) & DAY_MASK
+        hours = []
+        while day_bits:
+            low = day_bits & -day_bits
+            hours.append(low.bit_length() - 1)
+            day_bits ^= low
+        out[day] = hours
+    return out
+
+
+def intersect_masks(masks: Iterable[int]) -> int:
+    """
+    Bitwise AND across every mask; an empty group has no common hours.
+    """
+    masks = list(masks)
+    if not masks:
+        return 0
+    return reduce(lambda a, b: a & b, masks, FULL_WEEK)
+
+
+def masks_to_matrix(masks: List[int]) -> np.ndarray:
+    """
+    Unpacks N week masks into an (N, 168) uint8 matrix, one row per user.
+    """
+    if not masks:
+        return np.zeros((0, WEEK_SLOTS), dtype=np.uint8)
+    raw = b"".join(m.to_bytes(WEEK_BYTES, "little") for m in masks)
+    packed = np.frombuffer(raw, dtype=np.uint8).reshape(len(masks), WEEK_BYTES)
+    return np.unpackbits(packed, axis=1, bitorder="little")
+
+
+def coverage_counts(masks: List[int]) -> np.ndarray:
+    """
+    Number of free users per week slot (length 168), computed as a column sum.
+    """
+    return masks_to_matrix(masks).sum(axis=0, dtype=np.int32)
+
+
+def best_coverage(masks: List[int], min_users: int) -> Dict[str, List[dict]]:
+    """
+    Hours where at least `min_users` of the group are free: {day -> [{"hour", "free"}]}
+    """
+    counts = coverage_counts(masks)
+    out = {day: [] for day in WEEKDAYS}
+    for slot in np.flatnonzero(counts >= max(min_users, 1)):
+        day_index, hour = divmod(int(slot), HOURS_PER_DAY)
+        out[WEEKDAYS[day_index]].append({"hour": hour, "free": int(counts[slot])})
+    return out
@@ -0,0 +1,134 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+# relative so suggestion-service can load this package as a library in co-located mode
+from .bitmask import HOURS_PER_DAY, WEEKDAYS
+
+# Minute-granularity availability: every list is sorted, non-overlapping [start, end) pairs in
+# minutes since midnight. Merging sorts once (O(n log n)); intersecting and subtracting sorted
+# lists is a single linear sweep, so cost follows the number of intervals, not of slots.
+MINUTES_PER_DAY = HOURS_PER_DAY * 60
+
+
+def merge(intervals: Iterable) -> List[list]:
+    """
+    Sorts and coalesces overlapping or touching intervals; empty ones are dropped.
+    """
+    out = []
+    for start, end in sorted((int(s), int(e)) for s, e in intervals):
+        if end <= start:
+            continue
+        if out and start <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], end)
+        else:
+            out.append([start, end])
+    return out
+
+
+def intersect(a: List[list], b: List[list]) -> List[list]:
+    """
+    Intersection of two merged lists in O(len(a) + len(b)).
+    """
+    out = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start < end:
+            out.append([start, end])
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+
+def intersect_many(lists: Iterable[List[list]]) -> List[list]:
+    lists = sorted(lists, key=len)
+    if not lists:
+        return []
+    # shortest first so the running result shrinks as early as possible
+    result = lists[0]
+    for other in lists[1:]:
+        if not result:
+            break
+        result = intersect(result, other)
+    return result
+
+
+def subtract(a: List[list], b: List[list]) -> List[list]:
+    """
+    Parts of merged list `a` not covered by merged list `b`.
+    """
+    out = []
+    j = 0
+    for start, end in a:
+        while j < len(b) and b[j][1] <= start:
+            j += 1
+        cursor = start
+        k = j
+        while k < len(b) and b[k][0] < end:
+            if b[k][0] > cursor:
+                out.append([cursor, b[k][0]])
+            cursor = max(cursor, b[k][1])
+            k += 1
+        if cursor < end:
+            out.append([cursor, end])
+    return out
+
+
+def fit(intervals: List[list], duration: Optional[int]) -> List[list]:
+    """
+    Keeps the intervals long enough to hold a meeting of `duration` minutes.
+    """
+    if not duration:
+        return intervals
+    return [iv for iv in intervals if iv[1] - iv[0] >= duration]
+
+
+def hours_to_intervals(hours: Iterable[int]) -> List[list]:
+    return merge(
+        (h * 60, h * 60 + 60) for h in hours or [] if isinstance(h, int) and 0 <= h < HOURS_PER_DAY
+    )
+
+
+def weekly_intervals(record: dict) -> Dict[str, List[list]]:
+    """
+    The user's weekly template: explicit minute `intervals` when set, otherwise their whole hours.
+    """
+    explicit = record.get("intervals")
+    if explicit:
+        return {day: merge(explicit.get(day) or []) for day in WEEKDAYS}
+    avails = record.get("availabilities") or {}
+    return {day: hours_to_intervals(avails.get(day)) for day in WEEKDAYS}
+
+
+def intervals_on(record: dict, day: date, weekly: Optional[Dict[str, List[list]]] = None) -> List[list]:
+    """
+    A concrete date: its override when one exists, else the weekday template, minus that date's exceptions.
+    """
+    key = day.isoformat()
+    overrides = record.get("overrides") or {}
+    if key in overrides:
+        base = merge(overrides[key])
+    else:
+        base = (weekly or weekly_intervals(record))[WEEKDAYS[day.weekday()]]
+    blocked = (record.get("exceptions") or {}).get(key)
+    return subtract(base, merge(blocked)) if blocked else base
+
+
+def common_weekly(records: List[dict], duration: Optional[int] = None) -> Dict[str, List[list]]:
+    weeklies = [weekly_intervals(r) for r in records]
+    return {day: fit(intersect_many(w[day] for w in weeklies), duration) for day in WEEKDAYS}
+
+
+def common_dates(records: List[dict], start: date, days: int, duration: Optional[int] = None) -> Dict[str, List[list]]:
+    weeklies = [weekly_intervals(r) for r in records]
+    out = {}
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        out[day.isoformat()] = fit(
+            intersect_many(intervals_on(r, day, w) for r, w in zip(records, weeklies)),
+            duration,
+        )
+    return out
@@ -0,0 +1,109 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class L1Cache:
+    """
+    Bounded in-process LRU with a per-entry TTL, holding per-user availability records
+    (with their precomputed week mask) so hot lookups never leave the process. Expired entries
+    stay until evicted or invalidated, so a miss can revalidate them (see `stale`) instead of
+    downloading the record again.
+
+    Loads take a `token()` before calling user-service and hand it to `put`/`revalidate`; a write
+    is dropped when its key was invalidated (or the cache cleared) after the token was taken, so
+    a load that raced an invalidation can't put the old record back.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.revalidations = 0
+        self.stale_writes = 0
+        # invalidation sequence: every invalidate/clear bumps it; tokens below _floor are stale
+        # for every key (cleared, or the per-key history was pruned)
+        self._seq = 0
+        self._floor = 0
+        self._invalidated_at: Dict[str, int] = {}
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def token(self) -> int:
+        return self._seq
+
+    def _changed_since(self, key: str, token: int) -> bool:
+        return token < self._floor or self._invalidated_at.get(key, 0) > token
+
+    def put(self, key: str, value: dict, token: Optional[int] = None):
+        if self.max_entries <= 0:
+            return
+        if token is not None and self._changed_since(key, token):
+            self.stale_writes += 1
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stale(self, key: str) -> Optional[dict]:
+        """
+        The entry's value even if it has expired, without touching LRU order or hit counts.
+        """
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def revalidate(self, key: str, value: dict, token: Optional[int] = None):
+        # the owner confirmed an expired copy is still current: same value, fresh TTL
+        if token is not None and self._changed_since(key, token):
+            self.stale_writes += 1
+            return
+        self.put(key, value)
+        self.revalidations += 1
+
+    def invalidate(self, key: str):
+        # recorded even when nothing is cached: that is exactly when a load may be in flight
+        self._seq += 1
+        self._invalidated_at[key] = self._seq
+        if len(self._invalidated_at) > max(self.max_entries, 1024):
+            self._invalidated_at.clear()
+            self._floor = self._seq
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._seq += 1
+        self._floor = self._seq
+        self._invalidated_at.clear()
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "revalidations": self.revalidations,
+            "stale_writes": self.stale_writes,
+        }
@@ -1,16 +1,99 @@
 from fastapi import FastAPI, HTTPException, Query, Request, Response,status
 from fastapi.exceptions import RequestValidationError
 from typing import Optional, List
-import httpx
 import os
+import socket
 import uuid
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 import time
+from datetime import date
 import logging
+import asyncio
+import json
+import hashlib
+import httpx
+import redis.asyncio as redis
+from contextlib import asynccontextmanager
+from app.bitmask import best_coverage, from_week_mask, intersect_masks, to_week_mask
+from app.http_pool import DownstreamClient
+from app.intervals import MINUTES_PER_DAY, common_dates, common_weekly
+from app.l1_cache import L1Cache
+from app.metrics import metrics_response, observe_request, route_label, stats_collector
+from app.singleflight import SingleFlight
+from app.log_pipeline import RequestLogSampler, setup_logging
+from app.tracing import PARENT_HEADER, Tracer
 
 
-app = FastAPI(root_path="/availabilities")
 USER_SERVICE_BASE = os.getenv("USER_SERVICE_BASE", "http://user-service:8000")
+user_service = DownstreamClient("user-service", USER_SERVICE_BASE)
+
+# L1 cache of per-user records in front of user-service, kept coherent by the
+# invalidation channel user-service publishes to on update/delete
+INVALIDATION_CHANNEL = os.getenv("USER_INVALIDATION_CHANNEL", "user-avail-invalidate")
+user_l1 = L1Cache(
+    max_entries=int(os.getenv("L1_CACHE_MAX_ENTRIES", 10000)),
+    ttl_seconds=float(os.getenv("L1_CACHE_TTL_SECONDS", 60)),
+)
+user_fetches = SingleFlight()
+# identical concurrent /availabilities requests share one computation
+pair_computations = SingleFlight()
+tracer = Tracer("availability-service")
+stats_collector.add_cache("user_l1", user_l1.stats)
+stats_collector.add_component("single_flight", user_fetches.stats, counters=("leaders", "coalesced"))
+stats_collector.add_component("pair_single_flight", pair_computations.stats, counters=("leaders", "coalesced"))
+stats_collector.add_component("user_service_pool", user_service.stats, counters=("requests", "errors"))
+stats_collector.add_component("tracer", tracer.stats, counters=("exported", "dropped"))
+redis_client = redis.Redis(
+    host=os.getenv("REDIS_HOST", "redis"),
+    port=int(os.getenv("REDIS_PORT", 6379)),
+    decode_responses=True,
+)
+
+
+async def listen_for_invalidations():
+    while True:
+        try:
+            pubsub = redis_client.pubsub()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            logger.info(f"L1 CACHE: subscribed to {INVALIDATION_CHANNEL}")
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                email = json.loads(message["data"]).get("email")
+                if email:
+                    user_l1.invalidate(email)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # updates published while disconnected are lost, so start over cold
+            logger.error(f"L1 CACHE: invalidation listener failed, clearing cache err={e}")
+            user_l1.clear()
+            await asyncio.sleep(1)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await user_service.start()
+    listener = asyncio.create_task(listen_for_invalidations())
+    exporter = asyncio.create_task(tracer.run())
+    yield
+    listener.cancel()
+    exporter.cancel()
+    await asyncio.gather(listener, exporter, return_exceptions=True)
+    await redis_client.aclose()
+    await user_service.close()
+
+
+app = FastAPI(root_path="/availabilities", lifespan=lifespan)
+MAX_GROUP_SIZE = int(os.getenv("MAX_GROUP_SIZE", 500))
+# longest concrete-date window one request may resolve
+MAX_DATE_RANGE_DAYS = int(os.getenv("MAX_DATE_RANGE_DAYS", 62))
+# user-service fan-out: cache misses are loaded in chunks of FETCH_CHUNK_SIZE emails, at most
+# FETCH_CONCURRENCY chunk calls in flight per request, all inside one REQUEST_BUDGET_SECONDS budget
+FETCH_CHUNK_SIZE = int(os.getenv("FETCH_CHUNK_SIZE", 100))
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", 4))
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", 5))
 WEEKDAYS = [
     "monday", "tuesday", "wednesday", "thursday",
     "friday", "saturday", "sunday",
@@ -18,14 +101,10 @@ WEEKDAYS = [
 
 os.makedirs("logs", exist_ok=True)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    handlers=[
-        logging.FileHandler("logs/availability_log.txt", mode="a"),
-        logging.StreamHandler(),
-    ],
-)
+log_handler = setup_logging("availability-service", "logs/availability_log.txt")
+# which finished requests get a log line (errors and slow requests always do)
+request_sampler = RequestLogSampler.from_env()
+stats_collector.add_component("logging", lambda: {"dropped": log_handler.dropped, "queued": log_handler.queue.qsize()}, counters=("dropped",))
 logger = logging.getLogger("availability-service")
 
 @app.middleware("http")
@@ -33,11 +112,20 @@ async def add_case_id(request: Request, call_next):
     case_id = request.headers.get("Case-ID", str(uuid.uuid4()))
     request.state.case_id = case_id
     perf=time.perf_counter()
-    logger.info(f"[{case_id}] Request started - Method={request.method} Path={request.url.path}")
+    logger.debug("[%s] Request started - Method=%s Path=%s", case_id, request.method, request.url.path)
     #Pass the request forward to the next middleware in the nextservice chain
-    response = await call_next(request)
+    with tracer.span(request.url.path, trace_id=case_id, parent_id=request.headers.get(PARENT_HEADER)) as span:
+        response = await call_next(request)
+        span.rename(f"{request.method} {route_label(request)}")
+        span.set("status", response.status_code)
     response.headers["Case-ID"] = case_id
-    logger.info(f"[{case_id}] Request completed - Status={response.status_code}, , Time taken={(time.perf_counter()-perf)*1000:.2f} ms")
+    elapsed = time.perf_counter() - perf
+    observe_request(request, response.status_code, elapsed)
+    if request_sampler.keep(route_label(request), response.status_code, elapsed * 1000):
+        logger.info(
+            "[%s] Request completed - Method=%s Path=%s Status=%s, Time taken=%.2f ms",
+            case_id, request.method, request.url.path, response.status_code, elapsed * 1000,
+        )
     return response
 
 @app.exception_handler(HTTPException)
@@ -87,9 +175,7 @@ async def health_check(response: Response, request: Request):
     status_indicator="healthy"
     dependencies={}
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            headers = {"Case-ID": case_id}
-            resp = await client.get(f"{USER_SERVICE_BASE}/health", headers=headers)
+        resp = await user_service.get("/health", headers={"Case-ID": case_id}, timeout=5.0)
         if resp.status_code==200:
             dependencies["user-service"]={"status":resp.json().get("status"),"response_time_ms":(time.perf_counter()-start_time)*1000}
         else:
@@ -101,6 +187,7 @@ async def health_check(response: Response, request: Request):
         status_indicator = "unhealthy"
         dependencies["user-service"] = {"status": "unhealthy", "error": str(e)}
         logger.error(f"[{case_id}] ERROR CALL user-service endpoint=/health status=unreachable error={e}")
+    dependencies["user-service"]["pool"] = user_service.stats()
     
     if status_indicator=="unhealthy":
         response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
@@ -134,58 +221,298 @@ def compute_common_availability(request:Request,avails_list: List[dict]) -> dict
         logging.error(f"[{case_id}] ERROR COMPUTING AVAILABILITIES: No users")
         return {day: [] for day in weekdays}
 
-    common = {day: set(range(24)) for day in weekdays}
+    # one 168-bit mask per user, ANDed together
+    common = intersect_masks(to_week_mask(av) for av in avails_list)
+    return from_week_mask(common)
+
+async def load_user_avails(emails: List[str], case_id: str, deadline: Optional[float] = None) -> dict:
+    """
+    One user-service batch call for every email; returns {email -> record with "mask"}.
+    Emails with an expired L1 copy are sent with its ETag, and the copies user-service reports
+    as not modified are reused instead of downloaded again.
+    deadline: event-loop time the call must finish by; its remainder becomes the call's timeout
+    """
+    # taken before the call: writes for emails invalidated while it is in flight are dropped
+    token = user_l1.token()
+    known = {}
+    for email in emails:
+        record = user_l1.stale(email)
+        if record is not None and record.get("etag"):
+            known[email] = record
+    timeout = {}
+    if deadline is not None:
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            raise HTTPException(status_code=504, detail="Request budget exhausted before calling user service")
+        timeout = {"timeout": remaining}
+    try:
+        resp = await user_service.post(
+            "/user-avail/batch",
+            json={"emails": emails, "known_etags": {email: record["etag"] for email, record in known.items()}},
+            headers={"Case-ID": case_id},
+            **timeout,
+        )
+    except httpx.TimeoutException:
+        logger.error(f"[{case_id}] ERROR CALL user-service status=timeout emails={len(emails)}")
+        raise HTTPException(status_code=504, detail="User service did not answer within the request budget")
+    except Exception as e:
+        logger.error(f"[{case_id}] ERROR CALL user-service status=unreachable error={e}")
+        raise HTTPException(status_code=503, detail="User service is unavailable")
+
+    if resp.status_code == 503:
+        raise HTTPException(status_code=503, detail="User service is unavailable")
+    if resp.status_code >= 400:
+        logger.error(f"[{case_id}] ERROR CALL user-service endpoint=/user-avail/batch status={resp.status_code}")
+        raise HTTPException(status_code=502, detail="User service error")
+
+    data = resp.json()
+    users = data.get("users", {})
+    etags = data.get("etags", {})
+    for email, record in users.items():
+        record["mask"] = to_week_mask(record.get("availabilities", {}))
+        record["etag"] = etags.get(email)
+        user_l1.put(email, record, token)
+    for email in data.get("not_modified", []):
+        if email in known:
+            users[email] = known[email]
+            user_l1.revalidate(email, known[email], token)
+    return users
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    If-None-Match check with weak comparison: "*", or any listed tag with or without W/.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+class UsersNotFound(Exception):
+    def __init__(self, emails: List[str]):
+        super().__init__(emails)
+        self.emails = emails
+
+
+async def fetch_user_avails(
+    emails: List[Optional[str]],
+    case_id: str,
+    deadline: Optional[float] = None,
+    fail_fast: bool = True,
+):
+    """
+    Resolves users from the L1 cache and loads the misses from user-service in chunks, at most
+    FETCH_CONCURRENCY chunk calls at a time, all bounded by `deadline` (event-loop time; defaults
+    to REQUEST_BUDGET_SECONDS from now). Concurrent requests missing on the same email share a
+    single in-flight load.
+
+    fail_fast: the first chunk that reports a missing user cancels its siblings and the
+    result lists only the missing users seen so far; any chunk error is raised. Otherwise every
+    chunk runs to the deadline and chunks that fail or time out are reported, not raised.
+    returns: ({email -> user record}, [missing emails], [emails whose load failed])
+    """
+    emails = list(dict.fromkeys(emails))
+    if any(not email for email in emails):
+        return {}, [email for email in emails if not email], []
+
+    found = {}
+    for email in emails:
+        record = user_l1.get(email)
+        if record is not None:
+            found[email] = record
+    misses = [email for email in emails if email not in found]
+    if not misses:
+        return found, [], []
+
+    loop = asyncio.get_running_loop()
+    if deadline is None:
+        deadline = loop.time() + REQUEST_BUDGET_SECONDS
+    slots = asyncio.Semaphore(FETCH_CONCURRENCY)
 
-    for av in avails_list:
-        for day in weekdays:
-            user_hours = set(av.get(day, []))
-            common[day] = common[day].intersection(user_hours) # if no intersection it would sreturn an empty set
+    async def load_chunk(chunk: List[str]) -> dict:
+        async with slots:
+            loaded = await user_fetches.do_many(chunk, lambda owned: load_user_avails(owned, case_id, deadline))
+        absent = [email for email in chunk if loaded.get(email) is None]
+        if absent and fail_fast:
+            raise UsersNotFound(absent)
+        return loaded
+
+    chunks = [misses[i:i + FETCH_CHUNK_SIZE] for i in range(0, len(misses), FETCH_CHUNK_SIZE)]
+    failed = []
+    if fail_fast:
+        try:
+            async with asyncio.timeout_at(deadline):
+                async with asyncio.TaskGroup() as group:
+                    tasks = [group.create_task(load_chunk(chunk)) for chunk in chunks]
+        except TimeoutError:
+            logger.error(f"[{case_id}] ERROR CALL user-service status=budget_exhausted emails={len(misses)}")
+            raise HTTPException(status_code=504, detail="User service did not answer within the request budget")
+        except ExceptionGroup as eg:
+            # a 404 outranks whatever the cancelled siblings were doing
+            not_found = [e for e in eg.exceptions if isinstance(e, UsersNotFound)]
+            if not_found:
+                return found, [email for e in not_found for email in e.emails], []
+            raise eg.exceptions[0]
+        outcomes = [task.result() for task in tasks]
+    else:
+        tasks = [asyncio.create_task(load_chunk(chunk)) for chunk in chunks]
+        _, pending = await asyncio.wait(tasks, timeout=max(deadline - loop.time(), 0))
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        outcomes = []
+        for chunk, task in zip(chunks, tasks):
+            if task.cancelled() or task.exception() is not None:
+                failed.extend(chunk)
+            else:
+                outcomes.append(task.result())
+        if failed:
+            logger.error(f"[{case_id}] ERROR CALL user-service partial failure failed={len(failed)} of {len(misses)}")
+
+    for loaded in outcomes:
+        found.update({email: record for email, record in loaded.items() if record is not None})
+    return found, [email for email in misses if email not in found and email not in failed], failed
+
+
+class PairAnswer:
+    """
+    Both users of a pair, fetched once for every coalesced request; their common time is
+    computed by the first request that needs a body and reused by the rest.
+    """
+
+    def __init__(self, users: dict, intervals: bool, duration: Optional[int], from_date: Optional[date], days: int):
+        self.users = users
+        self.intervals = intervals
+        self.duration = duration
+        self.from_date = from_date
+        self.days = days
+        self._common = None
+
+    def common(self) -> dict:
+        if self._common is None:
+            pair = list(self.users.values())
+            common = {"common_availabilities": from_week_mask(intersect_masks([u["mask"] for u in pair]))}
+            # the interval engine only runs when asked, so hour-only callers pay nothing extra
+            if self.from_date is not None:
+                common["common_dates"] = common_dates(pair, self.from_date, self.days, self.duration)
+            elif self.intervals or self.duration:
+                common["common_intervals"] = common_weekly(pair, self.duration)
+            self._common = common
+        return self._common
+
+
+async def load_pair(userId1: str, userId2: str, case_id: str, **query) -> PairAnswer:
+    users, missing, _ = await fetch_user_avails([userId1, userId2], case_id)
+    if missing:
+        raise HTTPException(status_code=404, detail="One or both users not found")
+    return PairAnswer(users, **query)
 
-    # Convert sets back to sorted lists
-    return {day: sorted(list(hours)) for day, hours in common.items()}
 
 @app.get("/availabilities")
 async def get_common_avails(
     request: Request,
+    response: Response,
     userId1: Optional[str] = Query(None),
     userId2: Optional[str] = Query(None),
+    intervals: bool = Query(False, description="also return minute-level common intervals"),
+    duration: Optional[int] = Query(None, ge=1, le=MINUTES_PER_DAY, description="meeting length in minutes"),
+    from_date: Optional[date] = Query(None, description="resolve concrete dates (overrides, exceptions) from this day"),
+    days: int = Query(7, ge=1, le=MAX_DATE_RANGE_DAYS),
 ):
     case_id = getattr(request.state, "case_id", "N/A")
-    logger.info(f"[{case_id}] Computing common availability for userId1={userId1}, userId2={userId2}")
+    logger.info("[%s] Computing common availability for userId1=%s, userId2=%s", case_id, userId1, userId2)
 
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            user1_resp = await client.get(
-                f"{USER_SERVICE_BASE}/user-avail/cache-aside",
-                params={"user1email": userId1},
-                headers={"Case-ID": case_id},
-            )
-            user2_resp = await client.get(
-                f"{USER_SERVICE_BASE}/user-avail/cache-aside",
-                params={"user1email": userId2},
-                headers={"Case-ID": case_id},
-            )
-    except Exception as e:
-        logger.error(f"[{case_id}] ERROR CALL user-service status=unreachable error={e}")
-        raise HTTPException(status_code=503, detail="User service is unavailable")
+    # concurrent duplicates, in either user order, await one fetch and one computation
+    query = {"intervals": intervals, "duration": duration, "from_date": from_date, "days": days}
+    answer = await pair_computations.do(
+        (frozenset((userId1, userId2)), *query.values()),
+        lambda: load_pair(userId1, userId2, case_id, **query),
+    )
+    u1 = answer.users[userId1]
+    u2 = answer.users[userId2]
 
-    if user1_resp.status_code == 404 or user2_resp.status_code == 404:
-        raise HTTPException(status_code=404, detail="One or both users not found")
-    if user1_resp.status_code == 503 or user2_resp.status_code == 503:
-        raise HTTPException(status_code=503, detail="User service is unavailable")
-    if user1_resp.status_code >= 400 or user2_resp.status_code >= 400:
-        raise HTTPException(status_code=502, detail="User service error")
+    # the answer is a function of both users' records and the query, so their ETags and the
+    # query name it; a match skips computing and serializing the whole body
+    if u1.get("etag") and u2.get("etag"):
+        key = f"{u1['etag']}|{u2['etag']}|{intervals}|{duration}|{from_date}|{days}"
+        etag = f'"{hashlib.blake2b(key.encode(), digest_size=12).hexdigest()}"'
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+
+    common = answer.common()
+    result = {
+        "common_availabilities": common["common_availabilities"],
+        "user1preference": u1.get("preferences", "first"),
+        "user2preference": u2.get("preferences", "first"),
+        "user1version": u1.get("version"),
+        "user2version": u2.get("version"),
+    }
+    result.update((field, common[field]) for field in ("common_dates", "common_intervals") if field in common)
+    if duration:
+        result["duration"] = duration
+    return result
+
+
+class GroupAvailabilityIn(BaseModel):
+    emails: List[str] = Field(..., min_length=1)
+    min_users: Optional[int] = Field(None, ge=1)
+    # compute over the users that resolved and report the rest instead of failing the group
+    allow_partial: bool = False
+
+
+@app.post("/availabilities/group")
+async def get_group_avails(body: GroupAvailabilityIn, request: Request):
+    case_id = getattr(request.state, "case_id", "N/A")
+    emails = list(dict.fromkeys(body.emails))
+    if len(emails) > MAX_GROUP_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_GROUP_SIZE} users per group")
+    logger.info("[%s] Computing group availability for %d users", case_id, len(emails))
+
+    deadline = asyncio.get_running_loop().time() + REQUEST_BUDGET_SECONDS
+    found, missing, failed = await fetch_user_avails(emails, case_id, deadline, fail_fast=not body.allow_partial)
+    if missing and not body.allow_partial:
+        raise HTTPException(status_code=404, detail=f"Users not found: {', '.join(missing)}")
+    emails = [email for email in emails if email in found]
+    if not emails:
+        if failed:
+            raise HTTPException(status_code=503, detail="User service is unavailable")
+        raise HTTPException(status_code=404, detail="None of the users were found")
+    users = [found[email] for email in emails]
 
-    u1 = user1_resp.json()
-    u2 = user2_resp.json()
+    masks = [u["mask"] for u in users]
+    # default to "everyone but one" so near-misses show up next to the strict intersection
+    min_users = min(body.min_users or max(len(masks) - 1, 1), len(masks))
 
-    user1_avails = u1.get("availabilities", {})
-    user2_avails = u2.get("availabilities", {})
+    return {
+        "case_id": case_id,
+        "users": len(masks),
+        "common_availabilities": from_week_mask(intersect_masks(masks)),
+        "best_coverage": {
+            "min_users": min_users,
+            "hours": best_coverage(masks, min_users),
+        },
+        "preferences": {u.get("email", e): u.get("preferences", "first") for e, u in zip(emails, users)},
+        "partial": bool(missing or failed),
+        "missing": missing,
+        "failed": failed,
+    }
 
-    common = compute_common_availability(request, [user1_avails, user2_avails])
 
+@app.get("/cache/stats")
+async def cache_stats():
     return {
-        "common_availabilities": common,
-        "user1preference": u1.get("preferences", "first"),
-        "user2preference": u2.get("preferences", "first"),
+        # tells replicas apart behind the gateway
+        "replica": socket.gethostname(),
+        "l1": user_l1.stats(),
+        "single_flight": user_fetches.stats(),
+        "pair_single_flight": pair_computations.stats(),
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
@@ -0,0 +1,99 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List
+
+
+def _consume(fut: asyncio.Future):
+    # mark the outcome as retrieved so a failure nobody else waited on isn't logged as lost
+    if not fut.cancelled():
+        fut.exception()
+
+
+def _leader_cancelled(fut: asyncio.Future) -> bool:
+    # the shared load was cancelled with its leader's request (deadline, sibling 404), while this
+    # caller is still live: it should load the key itself rather than fail with the leader
+    return fut.cancelled() and not asyncio.current_task().cancelling()
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent work per key: the first caller runs the load, callers that
+    arrive while it is in flight await the same result instead of repeating it.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _claim(self, key: Hashable) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        fut.add_done_callback(_consume)
+        self._inflight[key] = fut
+        self.leaders += 1
+        return fut
+
+    def _settle(self, futures: Dict[Hashable, asyncio.Future], results: dict = None, error: BaseException = None):
+        for key, fut in futures.items():
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+            if fut.done():
+                continue
+            if isinstance(error, asyncio.CancelledError):
+                fut.cancel()
+            elif error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(results.get(key))
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not _leader_cancelled(fut):
+                    raise
+                return await self.do(key, fn)
+        fut = self._claim(key)
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._settle({key: fut}, error=e)
+            raise
+        self._settle({key: fut}, results={key: result})
+        return result
+
+    async def do_many(self, keys: Iterable[Hashable], fn: Callable[[List[Hashable]], Awaitable[dict]]) -> dict:
+        """
+        Batched variant: keys already in flight are awaited, the rest are loaded with one
+        fn(owned_keys) call returning {key -> value}. Keys fn leaves out resolve to None.
+        """
+        keys = list(dict.fromkeys(keys))
+        waiting = {k: self._inflight[k] for k in keys if k in self._inflight}
+        owned = {k: self._claim(k) for k in keys if k not in waiting}
+        self.coalesced += len(waiting)
+
+        results = {}
+        if owned:
+            try:
+                loaded = await fn(list(owned))
+            except BaseException as e:
+                self._settle(owned, error=e)
+                raise
+            self._settle(owned, results=loaded)
+            results.update({k: loaded.get(k) for k in owned})
+        retry = []
+        for key, fut in waiting.items():
+            try:
+                results[key] = await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not _leader_cancelled(fut):
+                    raise
+                retry.append(key)
+        if retry:
+            results.update(await self.do_many(retry, fn))
+        return results
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "leaders": self.leaders, "coalesced": self.coalesced}
@@ -0,0 +1,77 @@
+"""
+availability-service's L1 cache must not be refilled with a record that was invalidated while
+the load for it was still in flight. Runs without any services:
+
+    cd availability-service && python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+
+os.environ.setdefault("LOG_CONSOLE", "false")
+os.environ.setdefault("TRACE_ENABLED", "false")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.l1_cache import L1Cache  # noqa: E402
+
+
+def record(email, version):
+    return {"email": email, "version": version, "availabilities": {"monday": [9]}}
+
+
+def test_put_after_invalidation_is_dropped():
+    cache = L1Cache(max_entries=10, ttl_seconds=60)
+    token = cache.token()
+    cache.invalidate("a@x.com")
+    cache.put("a@x.com", record("a@x.com", 1), token)
+    assert cache.get("a@x.com") is None
+    assert cache.stats()["stale_writes"] == 1
+
+    # a load that started after the invalidation is current again
+    cache.put("a@x.com", record("a@x.com", 2), cache.token())
+    assert cache.get("a@x.com")["version"] == 2
+
+
+def test_other_keys_and_clear():
+    cache = L1Cache(max_entries=10, ttl_seconds=60)
+    token = cache.token()
+    cache.invalidate("a@x.com")
+    cache.put("b@x.com", record("b@x.com", 1), token)
+    assert cache.get("b@x.com") is not None
+
+    token = cache.token()
+    cache.clear()
+    cache.put("b@x.com", record("b@x.com", 1), token)
+    cache.revalidate("b@x.com", record("b@x.com", 1), token)
+    assert cache.stale("b@x.com") is None
+
+
+def test_invalidation_during_batch_load():
+    os.chdir(os.environ.get("TMPDIR", "/tmp"))
+    import app.main as main
+
+    email = "race@example.com"
+    request_sent = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_post(path, **kwargs):
+        # user-service read the old row; the update lands before the answer does
+        request_sent.set()
+        await release.wait()
+        return httpx.Response(200, json={"users": {email: record(email, 1)}, "etags": {email: '"1-0"'}})
+
+    async def scenario():
+        main.user_service.post = slow_post
+        load = asyncio.create_task(main.load_user_avails([email], "race-test"))
+        await request_sent.wait()
+        main.user_l1.invalidate(email)  # what the invalidation listener does on "update"
+        release.set()
+        users = await load
+        return users
+
+    users = asyncio.run(scenario())
+    # the caller that started before the update still gets its answer, but it isn't cached
+    assert users[email]["version"] == 1
+    assert main.user_l1.stale(email) is None
@@ -0,0 +1,139 @@
+"""
+Micro-benchmarks of the pure compute steps on the request path:
+
+    compute_common_availability   availability-service: N users' weekly hours -> common hours
+    pick_slot                     suggestion-service: common hours -> one slot per preference
+
+Inputs are random weeks drawn from `--seed`, so runs are comparable. Every case is timed in
+`--repeat` samples of `--number` calls; the report gives calls/s and the per-call p50/p95/p99
+in microseconds.
+
+    python benchmarks/bench_compute.py --repeat 200 --number 200
+
+Both services ship a package called `app`, so each service's functions are imported and
+timed in their own child process. Needs the two services' requirements, but no running services.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_user_service import WEEKDAYS, percentile  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+TARGETS = {
+    "availability": "availability-service",
+    "suggestion": "suggestion-service",
+}
+
+
+def random_week(rng, density):
+    return {day: sorted(h for h in range(24) if rng.random() < density) for day in WEEKDAYS}
+
+
+def measure(fn, repeat, number):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "calls_per_s": round(1e6 / (sum(samples) / len(samples)), 1),
+        "p50_us": round(percentile(samples, 50), 2),
+        "p95_us": round(percentile(samples, 95), 2),
+        "p99_us": round(percentile(samples, 99), 2),
+    }
+
+
+def import_service(target):
+    # quiet, side-effect free import: no console logs or span files, logs/ in a scratch dir
+    os.environ.setdefault("LOG_CONSOLE", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("TRACE_ENABLED", "false")
+    workdir = os.path.join(tempfile.gettempdir(), f"bench-compute-{target}")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.join(ROOT, TARGETS[target]))
+    import app.main
+
+    return app.main
+
+
+def bench_availability(args, rng):
+    main = import_service("availability")
+    request = SimpleNamespace(state=SimpleNamespace(case_id="bench"))
+    results = {}
+    for users in args.group_sizes:
+        avails = [random_week(rng, args.density) for _ in range(users)]
+        results[f"compute_common_availability users={users}"] = measure(
+            lambda: main.compute_common_availability(request, avails), args.repeat, args.number
+        )
+    return results
+
+
+def bench_suggestion(args, rng):
+    main = import_service("suggestion")
+    # what compute_common_availability hands back for a pair at this density
+    common = random_week(rng, args.density * args.density)
+    results = {}
+    for pref in ("first", "last", "random"):
+        results[f"pick_slot pref={pref}"] = measure(lambda: main.pick_slot(common, pref), args.repeat, args.number)
+    return results
+
+
+BENCHES = {"availability": bench_availability, "suggestion": bench_suggestion}
+
+
+def run_target(args, target):
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--only", target,
+        "--seed", str(args.seed), "--repeat", str(args.repeat), "--number", str(args.number),
+        "--density", str(args.density), "--group-sizes", *map(str, args.group_sizes),
+    ]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def run_all(args):
+    results = {}
+    for target in TARGETS:
+        results.update(run_target(args, target))
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=100, help="timed samples per case")
+    parser.add_argument("--number", type=int, default=100, help="calls per sample")
+    parser.add_argument("--density", type=float, default=0.4, help="share of a user's week that is free")
+    parser.add_argument("--group-sizes", type=int, nargs="+", default=[2, 10, 100])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--only", choices=list(TARGETS), help=argparse.SUPPRESS)
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.only:
+        print(json.dumps(BENCHES[args.only](args, random.Random(args.seed))))
+        return
+
+    report = {"seed": args.seed, "repeat": args.repeat, "number": args.number, "results": run_all(args)}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Request-log throughput: the old synchronous FileHandler setup against the queue-based
+pipeline in app/log_pipeline.py.
+
+Simulates `--requests` requests on one event loop, `--concurrency` at a time. Each one logs a
+start line and a completion line the way the add_case_id middleware does. Modes:
+
+    sync          basicConfig-style FileHandler + StreamHandler, f-string messages (the old setup)
+    queue         QueueHandler -> listener thread -> rotating JSON file, lazy %-style messages
+    queue+sample  as `queue`, with the start line at DEBUG and 10% of completions kept
+
+`--disk-latency-ms` adds a sleep to every file write to model a slow or contended disk. With
+the sync setup that sleep blocks the event loop; with the queue it lands on the listener thread.
+
+    python benchmarks/bench_logging.py --requests 20000 --concurrency 64 --disk-latency-ms 0.2
+
+Needs no running services. Log files go to a temporary directory.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "user-service"))
+
+from app.log_pipeline import RequestLogSampler, setup_logging  # noqa: E402
+
+from bench_user_service import percentile  # noqa: E402
+
+
+def slow_down(handler, latency_s):
+    if latency_s <= 0:
+        return
+    emit = handler.emit
+
+    def slow_emit(record):
+        time.sleep(latency_s)
+        emit(record)
+
+    handler.emit = slow_emit
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def setup_sync(path, latency_s):
+    reset_root()
+    file_handler = logging.FileHandler(path, mode="a")
+    console = logging.StreamHandler(open(os.devnull, "w"))
+    for handler in (file_handler, console):
+        handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+        logging.getLogger().addHandler(handler)
+    logging.getLogger().setLevel(logging.INFO)
+    slow_down(file_handler, latency_s)
+    return None
+
+
+def setup_queue(path, latency_s, queue_size):
+    reset_root()
+    queue_handler = setup_logging("bench", path, queue_size=queue_size)
+    for handler in queue_handler.listener.handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            handler.setStream(open(os.devnull, "w"))
+        else:
+            slow_down(handler, latency_s)
+    return queue_handler
+
+
+async def run_mode(mode, args, path):
+    latency_s = args.disk_latency_ms / 1000
+    if mode == "sync":
+        queue_handler = setup_sync(path, latency_s)
+    else:
+        # sized for the whole run so the comparison measures throughput, not drops
+        queue_handler = setup_queue(path, latency_s, queue_size=args.requests * 2 + 10)
+    sampler = RequestLogSampler(default_rate=0.1 if mode == "queue+sample" else 1.0)
+    logger = logging.getLogger("bench-service")
+    sem = asyncio.Semaphore(args.concurrency)
+    log_cost = []
+
+    async def one(i):
+        async with sem:
+            case_id = str(uuid.uuid4())
+            start = time.perf_counter()
+            if mode == "sync":
+                logger.info(f"[{case_id}] Request started - Method=GET Path=/users/u{i}@example.com")
+            else:
+                logger.debug("[%s] Request started - Method=%s Path=%s", case_id, "GET", f"/users/u{i}")
+            spent = time.perf_counter() - start
+            await asyncio.sleep(0)  # the handler's own awaits
+            elapsed_ms = 1.0
+            start = time.perf_counter()
+            if mode == "sync":
+                logger.info(f"[{case_id}] Request completed - Status=200, Time taken={elapsed_ms:.2f} ms")
+            elif sampler.keep("/users/{email_id}", 200, elapsed_ms):
+                logger.info(
+                    "[%s] Request completed - Method=%s Path=%s Status=%s, Time taken=%.2f ms",
+                    case_id, "GET", "/users/{email_id}", 200, elapsed_ms,
+                )
+            log_cost.append((spent + time.perf_counter() - start) * 1e6)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    loop_seconds = time.perf_counter() - start
+
+    drain_seconds = 0.0
+    dropped = 0
+    if queue_handler is not None:
+        drain_start = time.perf_counter()
+        queue_handler.listener.stop()
+        drain_seconds = time.perf_counter() - drain_start
+        dropped = queue_handler.dropped
+    reset_root()
+
+    return {
+        "requests_per_s": round(args.requests / loop_seconds, 1),
+        "event_loop_s": round(loop_seconds, 3),
+        "log_cost_us_p50": round(percentile(log_cost, 50), 2),
+        "log_cost_us_p99": round(percentile(log_cost, 99), 2),
+        "drain_after_s": round(drain_seconds, 3),
+        "dropped": dropped,
+        "file_bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+    }
+
+
+async def run(args):
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "disk_latency_ms": args.disk_latency_ms,
+        "modes": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes:
+            path = os.path.join(tmp, f"{mode.replace('+', '_')}.log")
+            report["modes"][mode] = await run_mode(mode, args, path)
+
+    base = report["modes"].get("sync")
+    if base:
+        report["speedup_vs_sync"] = {
+            mode: round(result["requests_per_s"] / base["requests_per_s"], 2)
+            for mode, result in report["modes"].items()
+            if mode != "sync"
+        }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--disk-latency-ms", type=float, default=0.0, help="sleep added to every file write")
+    parser.add_argument("--modes", nargs="+", default=["sync", "queue", "queue+sample"],
+                        choices=["sync", "queue", "queue+sample"])
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Cache locality across availability-service replicas: round-robin routing vs the gateway's
+consistent hash on the request's user (gateway-service/routing.js, upstreams.replicas.conf).
+
+Simulation (default, no services needed): replays a Zipf-skewed stream of
+/availabilities?userId1=..&userId2=.. requests against N in-process L1 caches
+(availability-service's own L1Cache, `--l1-entries` each) for every `--replicas` count.
+The consistent hash is modelled on nginx's `hash ... consistent` (160 CRC32 points per
+server name) on the gateway's key, the lower of the pair's two emails. For each replica count
+and routing it reports:
+
+    hit_ratio              L1 lookups answered in-process (also split by the routed user
+                           and the other one)
+    user_service_fetches   records that had to come from user-service
+    copies_per_user        how many replicas hold the same user on average
+    users_on_several_replicas
+                           share of cached users held by more than one replica: the higher
+                           user of a pair is cached wherever their partners route, by design,
+                           so part of the hit ratio is served from duplicated entries
+    duplicate_fetches_as_other
+                           fetches of a user already cached on another replica, made because
+                           they were the higher (unrouted) user of the pair
+    busiest_replica_share  share of requests on the most loaded replica (1/N is even)
+
+and, for adding one replica to each count, the share of users that move to another replica
+(about 1/(N+1) on the ring, against N/(N+1) for plain modulo hashing).
+
+    python benchmarks/bench_replica_routing.py --users 20000 --requests 200000 --replicas 1 2 4 8
+
+Live (`--base-url`): seeds `--users` users through the gateway, drives GET /availabilities
+at `--concurrency`, and reports throughput, p50/p95/p99 and the L1 hit ratio of every
+replica over the run. The counters come from /availability/cache/stats, which identifies
+the replica that answered. Run it once on the base stack and once with
+docker-compose.replicas.yml to see what the extra replicas add:
+
+    python benchmarks/bench_replica_routing.py --base-url http://localhost:8080 --users 2000 --requests 20000
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_user_service import percentile, seed_users  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+POINTS_PER_SERVER = 160
+
+
+class HashRing:
+    """
+    nginx's `hash $key consistent` ring: each server "host:port" gets 160 points, each the
+    CRC32 of host, NUL, port and the previous point; a key goes to the first point at or after
+    CRC32(key), wrapping around.
+    """
+
+    def __init__(self, servers):
+        points = []
+        for server in servers:
+            host, port = server.rsplit(":", 1)
+            base = host.encode() + b"\0" + port.encode()
+            prev = 0
+            for _ in range(POINTS_PER_SERVER):
+                prev = zlib.crc32(base + struct.pack("<I", prev))
+                points.append((prev, server))
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._servers = [s for _, s in points]
+
+    def lookup(self, key: str) -> str:
+        i = bisect.bisect_left(self._hashes, zlib.crc32(key.encode()))
+        return self._servers[i % len(self._servers)]
+
+
+def replica_names(count):
+    # the server names upstreams.replicas.conf uses
+    return [f"availability-service-{i}:8000" for i in range(1, count + 1)]
+
+
+def zipf_plan(rng, emails, requests, skew):
+    """
+    returns: [(userId1, userId2)], both drawn with weight 1/rank^skew over a shuffled ranking
+    """
+    ranked = list(emails)
+    rng.shuffle(ranked)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(len(ranked))))
+    plan = []
+    while len(plan) < requests:
+        user1, user2 = rng.choices(ranked, cum_weights=cum_weights, k=2)
+        if user1 != user2:
+            plan.append((user1, user2))
+    return plan
+
+
+def simulate(plan, replicas, routing, l1_entries):
+    sys.path.insert(0, os.path.join(ROOT, "availability-service"))
+    from app.l1_cache import L1Cache
+
+    names = replica_names(replicas)
+    caches = {name: L1Cache(max_entries=l1_entries, ttl_seconds=float("inf")) for name in names}
+    served = dict.fromkeys(names, 0)
+    ring = HashRing(names)
+    # misses by role: the gateway routes on the lower email only, so the other user gets no locality
+    misses = [0, 0]
+    duplicate_fetches = 0
+    for i, (user1, user2) in enumerate(plan):
+        routed, other = sorted((user1, user2))
+        name = ring.lookup(routed) if routing == "consistent-hash" else names[i % replicas]
+        served[name] += 1
+        cache = caches[name]
+        for position, email in enumerate((routed, other)):
+            if cache.get(email) is None:
+                if position == 1 and any(email in c._entries for c in caches.values()):
+                    duplicate_fetches += 1
+                cache.put(email, {})
+                misses[position] += 1
+
+    hits = sum(c.hits for c in caches.values())
+    lookups = hits + sum(c.misses for c in caches.values())
+    entries = sum(len(c._entries) for c in caches.values())
+    distinct = len(set().union(*(c._entries for c in caches.values())))
+    holders = {}
+    for c in caches.values():
+        for email in c._entries:
+            holders[email] = holders.get(email, 0) + 1
+    return {
+        "replicas": replicas,
+        "routing": routing,
+        "hit_ratio": round(hits / lookups, 4),
+        "hit_ratio_routed_user": round(1 - misses[0] / len(plan), 4),
+        "hit_ratio_other_user": round(1 - misses[1] / len(plan), 4),
+        "user_service_fetches": sum(misses),
+        "cached_entries": entries,
+        "copies_per_user": round(entries / distinct, 2) if distinct else 0.0,
+        "users_on_several_replicas": round(sum(n > 1 for n in holders.values()) / distinct, 4) if distinct else 0.0,
+        "duplicate_fetches_as_other": duplicate_fetches,
+        "busiest_replica_share": round(max(served.values()) / len(plan), 4),
+    }
+
+
+def moved_share(emails, before, after):
+    """
+    returns: (share of users whose replica changes going from `before` to `after` replicas
+    under the consistent hash, the same under plain CRC32 modulo hashing)
+    """
+    ring_before, ring_after = HashRing(replica_names(before)), HashRing(replica_names(after))
+    moved_ring = sum(ring_before.lookup(e) != ring_after.lookup(e) for e in emails)
+    moved_modulo = sum(zlib.crc32(e.encode()) % before != zlib.crc32(e.encode()) % after for e in emails)
+    return round(moved_ring / len(emails), 4), round(moved_modulo / len(emails), 4)
+
+
+def run_simulation(args):
+    rng = random.Random(args.seed)
+    emails = [f"sim_{i}@example.com" for i in range(args.users)]
+    plan = zipf_plan(rng, emails, args.requests, args.zipf)
+    counts = sorted(set(args.replicas))
+
+    results = [
+        simulate(plan, replicas, routing, args.l1_entries)
+        for replicas in counts
+        for routing in ("round-robin", "consistent-hash")
+    ]
+    scale_up = []
+    for replicas in counts:
+        ring, modulo = moved_share(emails, replicas, replicas + 1)
+        scale_up.append({"from": replicas, "to": replicas + 1, "users_moved": ring, "users_moved_modulo_hash": modulo})
+    return {
+        "mode": "simulation",
+        "users": args.users,
+        "requests": args.requests,
+        "zipf": args.zipf,
+        "l1_entries_per_replica": args.l1_entries,
+        "results": results,
+        "scale_up": scale_up,
+    }
+
+
+async def replica_stats(client, polls):
+    """
+    returns: {replica -> /cache/stats}; the stats call has no user, so the gateway spreads the
+    polls round-robin and `polls` well above the replica count reaches all of them
+    """
+    seen = {}
+    for _ in range(polls):
+        resp = await client.get("/availability/cache/stats")
+        resp.raise_for_status()
+        stats = resp.json()
+        seen[stats.get("replica", "unknown")] = stats
+    return seen
+
+
+async def run_live(args):
+    rng = random.Random(args.seed)
+    emails = [f"route_{args.seed}_{i}@example.com" for i in range(args.users)]
+    plan = zipf_plan(rng, emails, args.requests, args.zipf)
+    base_url = args.base_url.rstrip("/")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async with httpx.AsyncClient(base_url=base_url + "/users", timeout=30.0) as users:
+            # POST /users is insert-if-absent, so re-seeding with the same seed leaves the same data
+            await seed_users(users, emails, rng)
+        before = await replica_stats(client, args.stats_polls)
+
+        latencies, errors = [], 0
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one(user1, user2):
+            nonlocal errors
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    resp = await client.get("/availability/availabilities", params={"userId1": user1, "userId2": user2})
+                    if resp.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(u1, u2) for u1, u2 in plan))
+        elapsed = time.perf_counter() - start
+        after = await replica_stats(client, args.stats_polls)
+
+    replicas = {}
+    for name, stats in after.items():
+        l1, earlier = stats["l1"], before.get(name, {}).get("l1", {})
+        hits = l1["hits"] - earlier.get("hits", 0)
+        misses = l1["misses"] - earlier.get("misses", 0)
+        replicas[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "entries": l1["entries"],
+        }
+    hits = sum(r["hits"] for r in replicas.values())
+    lookups = hits + sum(r["misses"] for r in replicas.values())
+    return {
+        "mode": "live",
+        "target": args.base_url,
+        "users": args.users,
+        "requests": len(plan),
+        "concurrency": args.concurrency,
+        "zipf": args.zipf,
+        "replicas_seen": len(replicas),
+        "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        "errors": errors,
+        "throughput_rps": round(len(plan) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "per_replica": replicas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="gateway of a running stack for the live run (default: simulate)")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew of the user popularity distribution")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4, 8], help="simulated replica counts")
+    parser.add_argument("--l1-entries", type=int, default=2000, help="simulated L1_CACHE_MAX_ENTRIES per replica")
+    parser.add_argument("--concurrency", type=int, default=32, help="live run only")
+    parser.add_argument("--stats-polls", type=int, default=20, help="live run: /cache/stats calls to find every replica")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_live(args)) if args.base_url else run_simulation(args)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Per-hop latency of the suggestion chain.
+
+Seeds users through user-service, then times random user pairs at each depth of the chain
+and prints p50/p95/p99 per level plus the p50 added by every hop:
+
+    user-service        POST /user-avail/batch                 (1 hop)
+    availability        GET  /availabilities                   (2 hops)
+    suggestion          GET  /suggestions                      (3 hops, or in-process when co-located)
+
+Pairs are drawn fresh for every request, so with enough users most suggestion calls miss the
+pair cache and actually walk the chain. To measure what co-located mode saves, run it once per
+mode and compare, or point --colocated-url at a second suggestion-service started with
+COLOCATED_MODE=true:
+
+    COLOCATED_MODE=false docker compose up -d && python benchmarks/bench_suggestion_hops.py --label http
+    COLOCATED_MODE=true docker compose up -d && python benchmarks/bench_suggestion_hops.py --label colocated
+
+Needs only httpx; the services must be running.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_user_service import percentile, seed_users  # noqa: E402
+
+
+def summary(samples, errors):
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(samples), 2) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p95_ms": round(percentile(samples, 95), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+    }
+
+
+async def time_level(client, pairs, concurrency, call):
+    samples, errors = [], 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(pair):
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            try:
+                resp = await call(client, *pair)
+                if resp.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(pair) for pair in pairs))
+    return summary(samples, errors)
+
+
+def user_batch(client, a, b):
+    return client.post("/user-avail/batch", json={"emails": [a, b]})
+
+
+def availability(client, a, b):
+    return client.get("/availabilities", params={"userId1": a, "userId2": b})
+
+
+def suggestion(client, a, b):
+    return client.get("/suggestions", params={"userId1": a, "userId2": b})
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    emails = [f"hops_{args.seed}_{i}@example.com" for i in range(args.users)]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    def pairs():
+        # a fresh draw per level so the suggestion pair cache can't serve one level from another
+        return [tuple(rng.sample(emails, 2)) for _ in range(args.requests)]
+
+    levels = [
+        ("user-service", args.user_url, user_batch),
+        ("availability", args.availability_url, availability),
+        ("suggestion", args.suggestion_url, suggestion),
+    ]
+    if args.colocated_url:
+        levels.append(("suggestion-colocated", args.colocated_url, suggestion))
+
+    report = {"label": args.label, "users": args.users, "requests": args.requests, "concurrency": args.concurrency, "levels": {}}
+    async with httpx.AsyncClient(base_url=args.user_url, timeout=30.0) as client:
+        await seed_users(client, emails, rng)
+
+    for name, url, call in levels:
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+            # warm the connection pool and the per-user caches so each level measures steady state
+            await time_level(client, pairs()[: args.concurrency], args.concurrency, call)
+            report["levels"][name] = await time_level(client, pairs(), args.concurrency, call)
+
+    p50 = {name: level["p50_ms"] for name, level in report["levels"].items()}
+    report["hop_p50_ms"] = {
+        "availability -> user-service": round(p50["availability"] - p50["user-service"], 2),
+        "suggestion -> availability": round(p50["suggestion"] - p50["availability"], 2),
+    }
+    if "suggestion-colocated" in p50:
+        report["hop_p50_ms"]["saved by co-location"] = round(p50["suggestion"] - p50["suggestion-colocated"], 2)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-url", default="http://localhost:8080/users")
+    parser.add_argument("--availability-url", default="http://localhost:8080/availability")
+    parser.add_argument("--suggestion-url", default="http://localhost:8080/suggestion")
+    parser.add_argument("--colocated-url", help="a second suggestion-service running with COLOCATED_MODE=true")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="", help="free-form tag stored in the report, e.g. http or colocated")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Concurrent load benchmark for user-service read/write handlers.
+
+Seeds a set of users, then fires a mixed workload (cache-aside reads, user reads and
+updates) at a fixed concurrency and prints p50/p95/p99 latency per route. Run it once
+against the synchronous build and once against the async build to compare:
+
+    python benchmarks/bench_user_service.py --base-url http://localhost:8080/users \
+        --users 200 --requests 5000 --concurrency 64
+
+Needs only httpx; the target service must be running.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def random_week(rng):
+    return {day: sorted(rng.sample(range(24), rng.randint(0, 10))) for day in WEEKDAYS}
+
+
+async def seed_users(client, emails, rng):
+    for email in emails:
+        resp = await client.post("/users", json={"email": email, "availabilities": random_week(rng)})
+        if resp.status_code not in (200, 201):
+            raise SystemExit(f"seeding {email} failed: HTTP {resp.status_code} {resp.text}")
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    emails = [f"bench_{args.seed}_{i}@example.com" for i in range(args.users)]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30.0) as client:
+        await seed_users(client, emails, rng)
+
+        async def one(i):
+            email = rng.choice(emails)
+            roll = rng.random()
+            if roll < args.write_ratio:
+                route = "PUT /users/{email}"
+                call = client.put(f"/users/{email}", json={"email": email, "availabilities": random_week(rng)})
+            elif roll < (1 + args.write_ratio) / 2:
+                route = "GET /users/{email}"
+                call = client.get(f"/users/{email}")
+            else:
+                route = "GET /user-avail/cache-aside"
+                call = client.get("/user-avail/cache-aside", params={"user1email": email})
+            start = time.perf_counter()
+            try:
+                resp = await call
+                if resp.status_code >= 400:
+                    errors[route] += 1
+            except httpx.HTTPError:
+                errors[route] += 1
+            latencies[route].append((time.perf_counter() - start) * 1000)
+
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(i):
+            async with sem:
+                await one(i)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "routes": {
+            route: {
+                "count": len(samples),
+                "errors": errors[route],
+                "mean_ms": round(statistics.fmean(samples), 2),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+            }
+            for route, samples in sorted(latencies.items())
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8080/users")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
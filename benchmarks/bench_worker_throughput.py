@@ -0,0 +1,153 @@
+"""
+Jobs/second of the worker-service consumer against an in-memory broker.
+
+Runs worker-service's JobConsumer (the same class the service wires to RabbitMQ) on an
+in-memory queue that honours prefetch and ack/reject like a RabbitMQ channel. The
+suggestion-service call is simulated with a fixed latency, so the numbers isolate the
+consumer's concurrency model:
+
+    python benchmarks/bench_worker_throughput.py --jobs 2000 --latency-ms 20
+
+Needs no running services.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker-service"))
+
+from app.consumer import JobConsumer  # noqa: E402
+
+
+class InMemoryMessage:
+    def __init__(self, broker, body: bytes):
+        self.broker = broker
+        self.body = body
+        self._settled = False
+
+    async def ack(self):
+        self._settle(True)
+
+    async def reject(self, requeue: bool = False):
+        self._settle(False)
+        if requeue:
+            self.broker.queue.put_nowait(self.body)
+
+    def _settle(self, ok: bool):
+        if self._settled:
+            return
+        self._settled = True
+        self.broker.unacked.release()
+        if ok:
+            self.broker.acked += 1
+        else:
+            self.broker.rejected += 1
+        if self.broker.acked + self.broker.rejected >= self.broker.expected:
+            self.broker.done.set()
+
+    @asynccontextmanager
+    async def process(self, requeue: bool = False):
+        try:
+            yield self
+        except Exception:
+            await self.reject(requeue=requeue)
+            raise
+        else:
+            await self.ack()
+
+
+class InMemoryBroker:
+    """
+    One queue, one consumer; at most `prefetch` deliveries are unacknowledged at a time.
+    """
+
+    def __init__(self, prefetch: int, expected: int):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.unacked = asyncio.Semaphore(prefetch)
+        self.expected = expected
+        self.acked = 0
+        self.rejected = 0
+        self.done = asyncio.Event()
+
+    async def deliver(self, callback):
+        while True:
+            await self.unacked.acquire()
+            body = await self.queue.get()
+            await callback(InMemoryMessage(self, body))
+
+
+async def run_config(name, jobs, latency, concurrency, prefetch, batch_size, batch_window, per_item):
+    async def run_job(payload):
+        await asyncio.sleep(latency)
+        return {"suggestions": []}
+
+    async def run_batch(payloads):
+        await asyncio.sleep(latency + per_item * len(payloads))
+        return [{"suggestions": []} for _ in payloads]
+
+    consumer = JobConsumer(
+        run_job,
+        run_batch=run_batch if batch_size > 1 else None,
+        concurrency=concurrency,
+        batch_size=batch_size,
+        batch_window=batch_window,
+    )
+    broker = InMemoryBroker(prefetch=prefetch, expected=jobs)
+    for i in range(jobs):
+        broker.queue.put_nowait(json.dumps({"job_id": str(i), "userId1": "a", "userId2": "b"}).encode())
+
+    started = time.perf_counter()
+    delivery = asyncio.create_task(broker.deliver(consumer.on_message))
+    await broker.done.wait()
+    elapsed = time.perf_counter() - started
+    delivery.cancel()
+    await asyncio.gather(delivery, return_exceptions=True)
+    await consumer.drain(timeout=5)
+
+    return {
+        "config": name,
+        "concurrency": concurrency,
+        "prefetch": prefetch,
+        "batch_size": batch_size,
+        "jobs": jobs,
+        "acked": broker.acked,
+        "elapsed_s": round(elapsed, 3),
+        "jobs_per_s": round(jobs / elapsed, 1),
+    }
+
+
+async def run(args):
+    latency = args.latency_ms / 1000
+    per_item = args.per_item_ms / 1000
+    configs = [
+        ("prefetch=1 (previous behaviour)", 1, 1, 1),
+        ("concurrency=8", 8, 8, 1),
+        ("concurrency=32", 32, 32, 1),
+        (f"concurrency=8 batch={args.batch_size}", 8, 8 * args.batch_size, args.batch_size),
+    ]
+    results = []
+    for name, concurrency, prefetch, batch_size in configs:
+        # the sequential baseline is slow by design; cap it so the run stays short
+        jobs = min(args.jobs, 200) if concurrency == 1 else args.jobs
+        results.append(await run_config(
+            name, jobs, latency, concurrency, prefetch, batch_size, args.batch_window_ms / 1000, per_item,
+        ))
+    print(json.dumps(results, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=20, help="simulated suggestion-service latency per call")
+    parser.add_argument("--per-item-ms", type=float, default=0.2, help="extra simulated latency per job in a batch call")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batch-window-ms", type=float, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+// Routing key for the replicated services (js_set $route_user in nginx.conf). Pair queries route
+// on the lower of the two emails, so (a, b) and (b, a) land on the same replica. What that
+// replica keeps to itself is the pair's result (suggestion pair cache, coalesced availability
+// answers) and the lower user's availability L1 entry. The higher user's L1 entry is duplicated
+// by design: it is fetched and cached on every replica that owns one of their partners
+// (benchmarks/bench_replica_routing.py reports how much). user-service routes the email in the
+// path. Requests without a user in the URL (health, docs, stats, bulk, and group/batch POSTs
+// whose users are in the body) get an empty key and go round-robin.
+
+function lower(a, b) {
+    if (!a || !b) {
+        return a || b || "";
+    }
+    return a < b ? a : b;
+}
+
+function routeUser(r) {
+    if (/^\/users\/users\/(bulk|export)$/.test(r.uri)) {
+        return "";
+    }
+    var path = r.uri.match(/^\/users\/users\/([^\/]+)/);
+    if (path) {
+        return path[1];
+    }
+    var args = r.args;
+    return lower(args.userId1, args.userId2) || lower(args.user1email, args.user2email);
+}
+
+export default { routeUser };
@@ -0,0 +1,3 @@
+-- Per-user availability version, bumped on every write. Downstream caches key on it
+-- (suggestion-service result cache) and use it to tell stale copies from fresh ones.
+ALTER TABLE useravail ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,55 @@
+-- Canonical weekly availability alongside the JSONB source of truth.
+-- Slot numbering matches availability-service/app/bitmask.py: slot = day_index * 24 + hour,
+-- days monday..sunday. In avail_mask, bit position i counted from the left is slot i, and
+-- free_slots lists the same slots as a sorted smallint array so a GIN index can serve
+-- "free at slot X" (@>) and "shares any slot with Y" (&&) lookups.
+ALTER TABLE useravail ADD COLUMN IF NOT EXISTS avail_mask bit(168);
+ALTER TABLE useravail ADD COLUMN IF NOT EXISTS free_slots smallint[];
+
+-- Anything in a day's array that isn't a whole number 0..23 ("9", 9.5, null, {...}, rows written
+-- before user-service validated hours) is skipped rather than failing the write or the backfill.
+CREATE OR REPLACE FUNCTION useravail_free_slots(avails jsonb) RETURNS smallint[]
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT COALESCE(array_agg(DISTINCT (d.idx - 1) * 24 + h.hour::int ORDER BY (d.idx - 1) * 24 + h.hour::int), '{}')::smallint[]
+  FROM unnest(ARRAY['monday','tuesday','wednesday','thursday','friday','saturday','sunday'])
+       WITH ORDINALITY AS d(day, idx)
+  CROSS JOIN LATERAL (
+    SELECT CASE WHEN jsonb_typeof(value) = 'number' THEN value::numeric END AS hour
+    FROM jsonb_array_elements(
+      CASE WHEN jsonb_typeof(avails -> d.day) = 'array' THEN avails -> d.day ELSE '[]'::jsonb END
+    )
+  ) AS h
+  WHERE h.hour BETWEEN 0 AND 23 AND h.hour = trunc(h.hour)
+$$;
+
+CREATE OR REPLACE FUNCTION useravail_week_mask(slots smallint[]) RETURNS bit(168)
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+  mask bit(168) := repeat('0', 168)::bit(168);
+  slot smallint;
+BEGIN
+  FOREACH slot IN ARRAY COALESCE(slots, '{}') LOOP
+    mask := set_bit(mask, slot, 1);
+  END LOOP;
+  RETURN mask;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION useravail_sync_mask() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  NEW.free_slots := useravail_free_slots(NEW.availabilities);
+  NEW.avail_mask := useravail_week_mask(NEW.free_slots);
+  RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS useravail_sync_mask ON useravail;
+CREATE TRIGGER useravail_sync_mask
+  BEFORE INSERT OR UPDATE OF availabilities ON useravail
+  FOR EACH ROW EXECUTE FUNCTION useravail_sync_mask();
+
+-- backfill rows written before this migration (the trigger fills both columns)
+UPDATE useravail SET availabilities = availabilities WHERE avail_mask IS NULL;
+
+CREATE INDEX IF NOT EXISTS useravail_free_slots_gin ON useravail USING gin (free_slots);
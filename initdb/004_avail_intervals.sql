@@ -0,0 +1,9 @@
+-- Minute-level availability next to the hour lists. All three are optional JSONB maps of
+-- [[start, end]] minute pairs (end exclusive, 0..1440), sorted and merged by user-service:
+--   weekly_intervals  weekday -> intervals, replacing the hour list for interval-aware readers
+--   date_overrides    YYYY-MM-DD -> intervals, replacing that date's weekday template
+--   date_exceptions   YYYY-MM-DD -> intervals blocked on that date
+-- availabilities stays the hour-level view (and feeds avail_mask/free_slots from 003).
+ALTER TABLE useravail ADD COLUMN IF NOT EXISTS weekly_intervals JSONB;
+ALTER TABLE useravail ADD COLUMN IF NOT EXISTS date_overrides JSONB;
+ALTER TABLE useravail ADD COLUMN IF NOT EXISTS date_exceptions JSONB;
@@ -0,0 +1,24 @@
+-- Partial availability updates (PATCH /users/{email}/availabilities) change a few hours with
+-- jsonb_set on the touched days and set avail_mask in the same statement with bit operations
+-- ((mask | added) & ~removed). When a statement changes avail_mask itself, the trigger trusts it
+-- and only refreshes free_slots from the mask instead of re-deriving both from the whole JSONB.
+-- Full writes (INSERT, PUT) don't touch avail_mask and still derive both from availabilities.
+CREATE OR REPLACE FUNCTION useravail_mask_slots(mask bit(168)) RETURNS smallint[]
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT COALESCE(array_agg(slot::smallint ORDER BY slot), '{}')::smallint[]
+  FROM generate_series(0, 167) AS slot
+  WHERE get_bit(mask, slot) = 1
+$$;
+
+CREATE OR REPLACE FUNCTION useravail_sync_mask() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP = 'UPDATE' AND NEW.avail_mask IS DISTINCT FROM OLD.avail_mask THEN
+    NEW.free_slots := useravail_mask_slots(NEW.avail_mask);
+  ELSE
+    NEW.free_slots := useravail_free_slots(NEW.availabilities);
+    NEW.avail_mask := useravail_week_mask(NEW.free_slots);
+  END IF;
+  RETURN NEW;
+END
+$$;
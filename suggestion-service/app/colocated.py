@@ -0,0 +1,114 @@
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+from datetime import date
+from typing import Dict, Optional
+
+from app.metrics import timed
+
+logger = logging.getLogger("suggestion-service")
+
+# availability-service's `app` package is imported under this name so it can sit next to
+# this service's own `app` package in one interpreter
+ENGINE_PACKAGE = "availability_engine"
+
+# user-service's cache schema (user-service/app/cache.py): one hash per user at `user:{email}`
+USER_KEY_PREFIX = "user:"
+AVAIL_PREFIX = "avail:"
+INTERVAL_FIELDS = ("intervals", "overrides", "exceptions")
+
+
+def load_engine(path: str):
+    """
+    Imports availability-service's bitmask and intervals modules from `<path>/app` as a library.
+    returns: (bitmask module, intervals module)
+    """
+    package_dir = os.path.join(path, "app")
+    spec = importlib.util.spec_from_file_location(
+        ENGINE_PACKAGE,
+        os.path.join(package_dir, "__init__.py"),
+        submodule_search_locations=[package_dir],
+    )
+    if spec is None:
+        raise ImportError(f"no availability-service package at {package_dir}")
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[ENGINE_PACKAGE] = package
+    spec.loader.exec_module(package)
+    return (
+        importlib.import_module(f"{ENGINE_PACKAGE}.bitmask"),
+        importlib.import_module(f"{ENGINE_PACKAGE}.intervals"),
+    )
+
+
+def decode_user(fields: Dict[str, str]) -> Optional[dict]:
+    # mirrors user-service's decode_record; legacy single-field hashes count as misses
+    if not fields or "email" not in fields or "availabilities" in fields:
+        return None
+    return {
+        "email": fields["email"],
+        "preferences": fields.get("preferences", "first"),
+        "availabilities": {
+            name[len(AVAIL_PREFIX):]: json.loads(value)
+            for name, value in fields.items()
+            if name.startswith(AVAIL_PREFIX)
+        },
+        "version": int(fields.get("version", 1)),
+        **{name: json.loads(fields[name]) if name in fields else None for name in INTERVAL_FIELDS},
+    }
+
+
+class ColocatedEngine:
+    """
+    Co-located fast path: reads both users straight from the shared Redis user cache and runs
+    availability-service's intersection engine in-process, skipping the availability-service
+    and user-service hops. Returns None whenever either user isn't cached (or Redis fails) so
+    the caller falls back to the HTTP chain, which also refills the cache.
+    """
+
+    def __init__(self, redis_client, engine_path: str):
+        self.redis = redis_client
+        self.engine_path = engine_path
+        self.bitmask, self.intervals = load_engine(engine_path)
+        self.hits = 0
+        self.fallbacks = 0
+        self.errors = 0
+
+    async def candidates(self, user1: str, user2: str, from_date: Optional[date] = None, days: int = 7) -> Optional[dict]:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hgetall(f"{USER_KEY_PREFIX}{user1}")
+            pipe.hgetall(f"{USER_KEY_PREFIX}{user2}")
+            with timed("redis", "colocated_users"):
+                fields = await pipe.execute()
+            u1, u2 = (decode_user(f) for f in fields)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"COLOCATED: user cache read failed, falling back to HTTP err={e}")
+            return None
+        if u1 is None or u2 is None:
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+
+        bitmask = self.bitmask
+        masks = [bitmask.to_week_mask(u1["availabilities"]), bitmask.to_week_mask(u2["availabilities"])]
+        return {
+            "common_availabilities": bitmask.from_week_mask(bitmask.intersect_masks(masks)),
+            "common_intervals": self.intervals.common_weekly([u1, u2]),
+            "common_dates": self.intervals.common_dates([u1, u2], from_date, days) if from_date else {},
+            "preferences": {user1: u1["preferences"], user2: u2["preferences"]},
+            "versions": {user1: u1["version"], user2: u2["version"]},
+        }
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.fallbacks + self.errors
+        return {
+            "engine_path": self.engine_path,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+import httpx
+
+from app import tracing
+from app.metrics import observe_downstream
+
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+class DownstreamClient:
+    """
+    One long-lived, connection-pooled httpx.AsyncClient per downstream service.
+    Opened in the app lifespan and shared by every request, so keep-alive
+    connections are reused instead of paying TCP setup on each hop.
+    """
+
+    def __init__(self, name: str, base_url: str):
+        self.name = name
+        self.base_url = base_url
+        self.max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+        self.max_keepalive = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+        self.connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", 2))
+        self.read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", 10))
+        self.http2 = _env_flag("HTTP2_ENABLED")
+        self.client: Optional[httpx.AsyncClient] = None
+
+        # pool saturation counters
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        if self.client is None:
+            raise RuntimeError(f"{self.name} client is not started")
+        self.in_flight += 1
+        self.requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        start = time.perf_counter()
+        status = "error"
+        with tracing.span(f"{method} {self.name}", path=path) as span:
+            # the callee's server span becomes a child of this client span
+            kwargs["headers"] = {**tracing.propagation_headers(), **(kwargs.get("headers") or {})}
+            try:
+                resp = await self.client.request(method, path, **kwargs)
+                status = str(resp.status_code)
+                return resp
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                span.set("status", status)
+                observe_downstream(self.name, method, status, time.perf_counter() - start)
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_connections": self.max_connections,
+            "saturation": round(self.in_flight / self.max_connections, 3) if self.max_connections else 0.0,
+            "requests": self.requests,
+            "errors": self.errors,
+            "http2": self.http2,
+        }
@@ -1,32 +1,109 @@
 import random
+from datetime import date
 from fastapi import FastAPI, HTTPException, Query, Request, Response,status
 from fastapi.exceptions import RequestValidationError
-from typing import Optional, List
-import httpx
+from typing import Literal, Optional, List
 import os
 import uuid
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 import time
 from fastapi.exceptions import HTTPException
-import requests
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import logging
-
-app = FastAPI(root_path="/suggestion-service")
+import redis.asyncio as redis
+from app.colocated import ColocatedEngine
+from app.http_pool import DownstreamClient
+from app.metrics import metrics_response, observe_request, route_label, stats_collector
+from app.ranking import hour_candidates, interval_candidates, parse_windows, score_key, top_k
+from app.result_cache import SuggestionCache
+from app.singleflight import SingleFlight
+from app.log_pipeline import RequestLogSampler, setup_logging
+from app.tracing import PARENT_HEADER, Tracer
 
 # External user service base (for validating userId on create/update)
 AVAIL_BASE = os.getenv("AVAIL_BASE", "http://availability-service:8000")
+availability_service = DownstreamClient("availability-service", AVAIL_BASE)
+
+# pair -> candidate cache, evicted by the version bumps user-service publishes on update/delete
+INVALIDATION_CHANNEL = os.getenv("USER_INVALIDATION_CHANNEL", "user-avail-invalidate")
+suggestion_cache = SuggestionCache(
+    max_entries=int(os.getenv("SUGGESTION_CACHE_MAX_ENTRIES", 50000)),
+    ttl_seconds=float(os.getenv("SUGGESTION_CACHE_TTL_SECONDS", 300)),
+)
+# concurrent misses on the same pair (in either order) share one trip down the chain
+candidate_fetches = SingleFlight()
+stats_collector.add_cache("suggestion_pairs", suggestion_cache.stats)
+stats_collector.add_component("single_flight", candidate_fetches.stats, counters=("leaders", "coalesced"))
+stats_collector.add_component("availability_service_pool", availability_service.stats, counters=("requests", "errors"))
+tracer = Tracer("suggestion-service")
+stats_collector.add_component("tracer", tracer.stats, counters=("exported", "dropped"))
+redis_client = redis.Redis(
+    host=os.getenv("REDIS_HOST", "redis"),
+    port=int(os.getenv("REDIS_PORT", 6379)),
+    decode_responses=True,
+)
+
+# co-located mode: run availability-service's engine in-process on the shared Redis user cache,
+# keeping the availability -> user HTTP chain only as the fallback for uncached users
+COLOCATED_MODE = os.getenv("COLOCATED_MODE", "false").lower() in ("1", "true", "yes")
+AVAILABILITY_ENGINE_PATH = os.getenv("AVAILABILITY_ENGINE_PATH", "/availability-service")
+colocated: Optional[ColocatedEngine] = None
+
+
+async def listen_for_invalidations():
+    while True:
+        try:
+            pubsub = redis_client.pubsub()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            logger.info(f"SUGGESTION CACHE: subscribed to {INVALIDATION_CHANNEL}")
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                event = json.loads(message["data"])
+                if event.get("email"):
+                    suggestion_cache.evict_user(event["email"], event.get("version"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # version bumps published while disconnected are lost, so start over cold
+            logger.error(f"SUGGESTION CACHE: invalidation listener failed, clearing cache err={e}")
+            suggestion_cache.clear()
+            await asyncio.sleep(1)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global colocated
+    await availability_service.start()
+    if COLOCATED_MODE:
+        try:
+            colocated = ColocatedEngine(redis_client, AVAILABILITY_ENGINE_PATH)
+            stats_collector.add_component("colocated", colocated.stats, counters=("hits", "fallbacks", "errors"))
+            logger.info(f"COLOCATED: availability engine loaded from {AVAILABILITY_ENGINE_PATH}")
+        except Exception as e:
+            logger.error(f"COLOCATED: could not load availability engine from {AVAILABILITY_ENGINE_PATH}, using HTTP only err={e}")
+    listener = asyncio.create_task(listen_for_invalidations())
+    exporter = asyncio.create_task(tracer.run())
+    yield
+    listener.cancel()
+    exporter.cancel()
+    await asyncio.gather(listener, exporter, return_exceptions=True)
+    await redis_client.aclose()
+    await availability_service.close()
+
+
+app = FastAPI(root_path="/suggestion-service", lifespan=lifespan)
 
 os.makedirs("logs", exist_ok=True)
 
 # this is an example that you can use
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("logs/suggest_log.txt", mode="a"),  # write to file
-        logging.StreamHandler()  # also show in console
-    ]
-)
+log_handler = setup_logging("suggestion-service", "logs/suggest_log.txt")
+# which finished requests get a log line (errors and slow requests always do)
+request_sampler = RequestLogSampler.from_env()
+stats_collector.add_component("logging", lambda: {"dropped": log_handler.dropped, "queued": log_handler.queue.qsize()}, counters=("dropped",))
 
 
 
@@ -38,11 +115,20 @@ async def add_case_id(request: Request, call_next):
     case_id = request.headers.get("Case-ID", str(uuid.uuid4()))
     request.state.case_id = case_id
     perf=time.perf_counter()
-    logger.info(f"[{case_id}] Request started - Method={request.method} Path={request.url.path}")
+    logger.debug("[%s] Request started - Method=%s Path=%s", case_id, request.method, request.url.path)
     #Pass the request forward to the next middleware in the nextservice chain
-    response = await call_next(request)
+    with tracer.span(request.url.path, trace_id=case_id, parent_id=request.headers.get(PARENT_HEADER)) as span:
+        response = await call_next(request)
+        span.rename(f"{request.method} {route_label(request)}")
+        span.set("status", response.status_code)
     response.headers["Case-ID"] = case_id
-    logger.info(f"[{case_id}] Request completed - Status={response.status_code}, , Time taken={(time.perf_counter()-perf)*1000:.2f} ms")
+    elapsed = time.perf_counter() - perf
+    observe_request(request, response.status_code, elapsed)
+    if request_sampler.keep(route_label(request), response.status_code, elapsed * 1000):
+        logger.info(
+            "[%s] Request completed - Method=%s Path=%s Status=%s, Time taken=%.2f ms",
+            case_id, request.method, request.url.path, response.status_code, elapsed * 1000,
+        )
     return response
 
 
@@ -94,7 +180,7 @@ async def health_check(request:Request,response: Response):
     status_indicator="healthy"
     dependencies={}
     try:
-        resp= await httpx.AsyncClient(timeout=5.0).get(f"{AVAIL_BASE}/health",headers={"Case-ID":cid})
+        resp= await availability_service.get("/health",headers={"Case-ID":cid},timeout=5.0)
         if resp.status_code==200:
             dependencies["availability-service"]={"status":resp.json().get("status","unknown"),"response_time_ms":(time.perf_counter()-start_time)*1000}
         else:
@@ -104,6 +190,7 @@ async def health_check(request:Request,response: Response):
     except Exception as e:
         dependencies["availability-service"]={"status":"unhealthy","response_time_ms":(time.perf_counter()-start_time)*1000}
         status_indicator="unhealthy"
+    dependencies["availability-service"]["pool"]=availability_service.stats()
     
     if status_indicator=="unhealthy":
         response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
@@ -144,13 +231,108 @@ def pick_slot(common_avails: dict, pref: str) -> Optional[dict]:
     }
 
 
-@app.get("/suggestions")
-async def get_suggestions(request:Request,userId1: Optional[str] = Query(None, description="User ID to get suggestions for"),
-                          userId2: Optional[str] = Query(None, description="Second User ID to get suggestions for")):
-    case_id = getattr(request.state, "case_id", "N/A")
-    logger.info(f"[{case_id}] Computing suggestions for userId1={userId1}, userId2={userId2}")
+# minute-level suggestions: start times are aligned to SLOT_MINUTES, meetings are `duration` long
+SLOT_MINUTES = int(os.getenv("SLOT_MINUTES", 15))
+MAX_DATE_RANGE_DAYS = int(os.getenv("MAX_DATE_RANGE_DAYS", 62))
+# ranked suggestions (k / policy / windows)
+DEFAULT_TOP_K = int(os.getenv("DEFAULT_TOP_K", 5))
+MAX_TOP_K = int(os.getenv("MAX_TOP_K", 50))
+Policy = Literal["earliest", "latest", "longest", "preferred"]
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def pick_interval(common: dict, duration: int, pref: str, by_date: bool = False) -> Optional[dict]:
+    """
+    common: { day or YYYY-MM-DD -> [[start, end]] minutes }, in calendar order
+    returns: { ["date",] "day", "start": "HH:MM", "end": "HH:MM", "minutes": [start, end] }
+    """
+    candidates = [
+        (key, start, end)
+        for key, intervals in (common or {}).items()
+        for start, end in intervals
+        if end - start >= duration
+    ]
+    if not candidates:
+        return None
+    if pref == "first":
+        key, start, _ = candidates[0]
+    elif pref == "last":
+        # latest start on the SLOT_MINUTES grid of that interval
+        key, first_start, end = candidates[-1]
+        start = first_start + (end - duration - first_start) // SLOT_MINUTES * SLOT_MINUTES
+    else:
+        key, start, end = random.choice(candidates)
+        start = random.choice(range(start, end - duration + 1, SLOT_MINUTES))
+    return _interval_slot(key, start, start + duration, by_date)
+
+
+def _interval_slot(key: str, start: int, end: int, by_date: bool) -> dict:
+    slot = {"day": key, "start": _clock(start), "end": _clock(end), "minutes": [start, end]}
+    if by_date:
+        slot = {"date": key, **slot, "day": date.fromisoformat(key).strftime("%A").lower()}
+    return slot
+
+
+def rank_slots(
+    candidates: dict,
+    k: int,
+    policy: str,
+    windows: List[list],
+    duration: Optional[int] = None,
+    by_date: bool = False,
+) -> list:
+    """
+    Top-k meetings under `policy`, streamed from the pair's common time through a bounded heap.
+    Whole-hour requests walk bit runs of the common mask; `duration`/date requests walk minute intervals.
+    """
+    key = score_key(policy, windows)
+    if by_date or duration:
+        common = candidates.get("common_dates") if by_date else candidates.get("common_intervals")
+        best = top_k(interval_candidates(common, duration or 60, SLOT_MINUTES), k, key)
+        return [_interval_slot(day, start, end, by_date) for _, day, start, end, _ in best]
+    best = top_k(hour_candidates(candidates.get("common_availabilities", {})), k, key)
+    return [{"day": day, "slot": [start // 60, end // 60]} for _, day, start, end, _ in best]
+
+
+async def fetch_candidates(
+    userId1: Optional[str],
+    userId2: Optional[str],
+    case_id: str,
+    from_date: Optional[date] = None,
+    days: int = 7,
+) -> dict:
+    """
+    Asks availability-service for the pair's common hours and minute intervals and caches them under
+    both users' versions. Concrete-date lookups (from_date) are answered fresh and not cached.
+    In co-located mode the answer is computed in-process when both users are in the Redis cache.
+    """
+    started = time.monotonic()
+    candidates = None
+    if colocated is not None and userId1 and userId2:
+        candidates = await colocated.candidates(userId1, userId2, from_date, days)
+    if candidates is None:
+        candidates = await fetch_remote_candidates(userId1, userId2, case_id, from_date, days)
+    # a missing user can't be keyed (pair_key sorts both emails); that answer just isn't cached
+    if from_date is None and userId1 and userId2:
+        suggestion_cache.put(userId1, userId2, candidates, started)
+    return candidates
+
+
+async def fetch_remote_candidates(
+    userId1: Optional[str],
+    userId2: Optional[str],
+    case_id: str,
+    from_date: Optional[date],
+    days: int,
+) -> dict:
+    params = {"userId1": userId1, "userId2": userId2, "intervals": "true"}
+    if from_date is not None:
+        params.update({"from_date": from_date.isoformat(), "days": days})
     try:
-        get_common_avails=await httpx.AsyncClient(timeout=10.0).get(f"{AVAIL_BASE}/availabilities", params={"userId1":userId1,"userId2":userId2}, headers={"CASE-ID":case_id})
+        get_common_avails=await availability_service.get("/availabilities", params=params, headers={"Case-ID":case_id})
     except Exception as e:
         logger.error(f"[{case_id}] availability-service unreachable: {e}")
         raise HTTPException(status_code=503, detail="Availability service is unavailable")
@@ -160,30 +342,148 @@ async def get_suggestions(request:Request,userId1: Optional[str] = Query(None, d
     if get_common_avails.status_code >= 400:
         raise HTTPException(status_code=502, detail="Availability service error")
 
+    body = get_common_avails.json()
+    return {
+        "common_availabilities": body.get("common_availabilities", {}),
+        "common_intervals": body.get("common_intervals", {}),
+        "common_dates": body.get("common_dates", {}),
+        "preferences": {
+            userId1: body.get("user1preference", "first"),
+            userId2: body.get("user2preference", "first"),
+        },
+        "versions": {
+            userId1: body.get("user1version"),
+            userId2: body.get("user2version"),
+        },
+    }
+
 
-    availabitilies_and_preferences=get_common_avails.json()
-    user2_preference = availabitilies_and_preferences.get("user2preference","first")
-    user1_preference = availabitilies_and_preferences.get("user1preference","first")
+async def suggest_for_pair(
+    userId1: Optional[str],
+    userId2: Optional[str],
+    case_id: str,
+    duration: Optional[int] = None,
+    from_date: Optional[date] = None,
+    days: int = 7,
+    k: Optional[int] = None,
+    policy: Optional[str] = None,
+    windows: Optional[List[list]] = None,
+) -> list:
+    candidates = None
+    if from_date is None and userId1 and userId2:
+        candidates = suggestion_cache.get(userId1, userId2)
+    if candidates is None:
+        # only the candidates are shared: each request still picks its own slot, so
+        # pref="random" stays random for every coalesced caller
+        candidates = await candidate_fetches.do(
+            (frozenset((userId1, userId2)), from_date, days if from_date else None),
+            lambda: fetch_candidates(userId1, userId2, case_id, from_date, days),
+        )
 
-    if not availabitilies_and_preferences:
-        return {"case_id": case_id, "suggestions": []}
-    
-    if user1_preference==user2_preference:
-        slot=pick_slot(availabitilies_and_preferences.get("common_availabilities",[]),user1_preference)
-        return {"case_id": case_id, "suggestions": [slot] if slot else []}
+    if k or policy or windows:
+        # ranked mode: an explicit policy replaces the users' stored first/last/random preferences
+        policy = policy or ("preferred" if windows else "earliest")
+        return rank_slots(candidates, k or DEFAULT_TOP_K, policy, windows or [], duration, from_date is not None)
+
+    user1_preference = candidates["preferences"].get(userId1, "first")
+    user2_preference = candidates["preferences"].get(userId2, "first")
+
+    if from_date is not None:
+        pick = lambda pref: pick_interval(candidates.get("common_dates"), duration or 60, pref, by_date=True)
+    elif duration:
+        pick = lambda pref: pick_interval(candidates.get("common_intervals"), duration, pref)
     else:
-        #if its unequal preferences we return one from each preference if possible
-        #different preferences
+        # no duration asked for: the original whole-hour answer, unchanged
+        common_avails = candidates.get("common_availabilities",{})
+        pick = lambda pref: pick_slot(common_avails, pref)
+
+    if user1_preference==user2_preference:
+        slot=pick(user1_preference)
+        return [slot] if slot else []
+
+    #if its unequal preferences we return one from each preference if possible
+    s1 = pick(user1_preference)
+    s2 = pick(user2_preference)
+
+    suggestions = []
+    if s1:
+        suggestions.append(s1)
+    if s2 and s2 != s1:
+        suggestions.append(s2)
+    return suggestions
+
+
+@app.get("/suggestions")
+async def get_suggestions(request:Request,userId1: Optional[str] = Query(None, description="User ID to get suggestions for"),
+                          userId2: Optional[str] = Query(None, description="Second User ID to get suggestions for"),
+                          duration: Optional[int] = Query(None, ge=1, le=1440, description="Meeting length in minutes"),
+                          from_date: Optional[date] = Query(None, description="Suggest concrete dates starting on this day"),
+                          days: int = Query(7, ge=1, le=MAX_DATE_RANGE_DAYS),
+                          k: Optional[int] = Query(None, ge=1, le=MAX_TOP_K, description="Return the k best slots"),
+                          policy: Optional[Policy] = Query(None, description="Ranking: earliest, latest, longest or preferred"),
+                          windows1: Optional[str] = Query(None, description="userId1's preferred windows, e.g. 09:00-12:00,14:00-17:00"),
+                          windows2: Optional[str] = Query(None, description="userId2's preferred windows")):
+    case_id = getattr(request.state, "case_id", "N/A")
+    logger.info(
+        "[%s] Computing suggestions for userId1=%s, userId2=%s duration=%s from_date=%s k=%s policy=%s",
+        case_id, userId1, userId2, duration, from_date, k, policy,
+    )
+    windows = _windows(windows1, windows2)
+    suggestions = await suggest_for_pair(userId1, userId2, case_id, duration, from_date, days, k, policy, windows)
+    return {"case_id": case_id, "suggestions": suggestions}
+
+
+def _windows(*specs: Optional[str]) -> List[list]:
+    if not any(specs):
+        return []
+    try:
+        return [parse_windows(spec) for spec in specs]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid preferred window: {e}")
+
+
+class SuggestionPair(BaseModel):
+    userId1: str
+    userId2: str
+    duration: Optional[int] = Field(None, ge=1, le=1440)
+    k: Optional[int] = Field(None, ge=1, le=MAX_TOP_K)
+    policy: Optional[Policy] = None
+
+
+class SuggestionBatchIn(BaseModel):
+    items: List[SuggestionPair] = Field(..., min_length=1, max_length=1000)
+
 
-        suggestions=[]
-        common_avails = availabitilies_and_preferences.get("common_availabilities",{})
-        s1 = pick_slot(common_avails, user1_preference)
-        s2 = pick_slot(common_avails, user2_preference)
+@app.post("/suggestions/batch")
+async def get_suggestions_batch(body: SuggestionBatchIn, request: Request):
+    """
+    Suggestions for many pairs in one call; each result carries its own status so one
+    missing user doesn't fail the rest of the batch.
+    """
+    case_id = getattr(request.state, "case_id", "N/A")
+    logger.info("[%s] Computing suggestions for a batch of %d pairs", case_id, len(body.items))
+
+    async def one(item: SuggestionPair) -> dict:
+        try:
+            suggestions = await suggest_for_pair(
+                item.userId1, item.userId2, case_id, item.duration, k=item.k, policy=item.policy,
+            )
+            return {"status": 200, "case_id": case_id, "suggestions": suggestions}
+        except HTTPException as e:
+            return {"status": e.status_code, "detail": e.detail}
+
+    return {"case_id": case_id, "results": await asyncio.gather(*(one(item) for item in body.items))}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        **suggestion_cache.stats(),
+        "colocated": colocated.stats() if colocated is not None else None,
+        "single_flight": candidate_fetches.stats(),
+    }
 
-        suggestions = []
-        if s1:
-            suggestions.append(s1)
-        if s2 and s2 != s1:
-            suggestions.append(s2)
 
-        return {"case_id": case_id, "suggestions": suggestions}
\ No newline at end of file
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
@@ -0,0 +1,103 @@
+import heapq
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# A candidate meeting: (order, key, start, end, block), times in minutes since midnight.
+# `order` is the position of `key` (weekday or YYYY-MM-DD) in calendar order and `block`
+# is the length of the free stretch the meeting sits in.
+Candidate = Tuple[int, str, int, int, int]
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+HOURS_PER_DAY = 24
+DAY_MASK = (1 << HOURS_PER_DAY) - 1
+
+
+def week_mask(common_hours: Dict[str, List[int]]) -> int:
+    """
+    {day -> [hours]} to a 168-bit mask, bit (day_index * 24 + hour) as in availability-service.
+    """
+    mask = 0
+    for day_index, day in enumerate(WEEKDAYS):
+        for h in common_hours.get(day) or []:
+            if 0 <= h < HOURS_PER_DAY:
+                mask |= 1 << (day_index * HOURS_PER_DAY + h)
+    return mask
+
+
+def day_runs(day_bits: int) -> Iterator[Tuple[int, int]]:
+    """
+    (start_hour, length) of every run of consecutive set bits, found with bit tricks:
+    run starts are set bits whose lower neighbour is clear, and a run's length is the
+    position of the lowest clear bit above its start.
+    """
+    starts = day_bits & ~(day_bits << 1)
+    while starts:
+        low = starts & -starts
+        start = low.bit_length() - 1
+        shifted = day_bits >> start
+        yield start, (~shifted & (shifted + 1)).bit_length() - 1
+        starts ^= low
+
+
+def hour_candidates(common_hours: Dict[str, List[int]]) -> Iterator[Candidate]:
+    """
+    Every one-hour meeting inside the pair's common whole hours, streamed in calendar order
+    and tagged with the length of the contiguous block it belongs to.
+    """
+    mask = week_mask(common_hours)
+    for day_index, day in enumerate(WEEKDAYS):
+        day_bits = (mask >> (day_index * HOURS_PER_DAY)) & DAY_MASK
+        for start, length in day_runs(day_bits):
+            for h in range(start, start + length):
+                yield day_index, day, h * 60, (h + 1) * 60, length * 60
+
+
+def interval_candidates(common: Dict[str, List[list]], duration: int, step: int) -> Iterator[Candidate]:
+    """
+    Every `duration`-minute meeting inside merged [start, end) intervals, starts on a `step` grid.
+    """
+    for order, (key, intervals) in enumerate((common or {}).items()):
+        for start, end in intervals:
+            for s in range(start, end - duration + 1, step):
+                yield order, key, s, s + duration, end - start
+
+
+def parse_windows(spec: Optional[str]) -> List[Tuple[int, int]]:
+    """
+    "09:00-12:00,14:00-17:30" to [(540, 720), (840, 1050)]. Raises ValueError on bad input.
+    """
+    windows = []
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        start, end = (_minutes(t) for t in part.split("-", 1))
+        if not 0 <= start < end <= HOURS_PER_DAY * 60:
+            raise ValueError(f"invalid window '{part}'")
+        windows.append((start, end))
+    return windows
+
+
+def _minutes(clock: str) -> int:
+    hours, _, minutes = clock.strip().partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def score_key(policy: str, windows: Sequence[List[Tuple[int, int]]] = ()) -> Callable[[Candidate], tuple]:
+    """
+    Sort key for `policy`; smaller is better and ties fall back to the earliest slot.
+    windows: one list of preferred (start, end) time-of-day windows per user
+    """
+    if policy == "latest":
+        return lambda c: (-c[0], -c[2])
+    if policy == "longest":
+        return lambda c: (-c[4], c[0], c[2])
+    if policy == "preferred":
+        def key(c: Candidate) -> tuple:
+            pleased = sum(any(ws <= c[2] and c[3] <= we for ws, we in user) for user in windows)
+            return (-pleased, c[0], c[2])
+        return key
+    return lambda c: (c[0], c[2])
+
+
+def top_k(candidates: Iterable[Candidate], k: int, key: Callable[[Candidate], tuple]) -> List[Candidate]:
+    # bounded heap over the stream: O(n log k) time, O(k) memory, no candidate list
+    return heapq.nsmallest(k, candidates, key=key)
@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+def pair_key(user_a: str, user_b: str) -> Tuple[str, str]:
+    # (a, b) and (b, a) ask the same question, so they share one entry
+    return tuple(sorted((user_a, user_b)))
+
+
+class SuggestionCache:
+    """
+    LRU/TTL cache of the inputs pick_slot needs for a user pair (common availability and each
+    user's preference), tagged with the availability version of both users. Caching the
+    candidates rather than the chosen slot keeps pref="random" random on every call.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._by_user: Dict[str, set] = {}
+        # newest version announced per user, so a fetch that raced an update can't be cached
+        self._floor: Dict[str, int] = {}
+        # when each user was last deleted (time.monotonic()), so a fetch that started before the
+        # delete can't be cached; a user re-created afterwards is fetched after it and caches fine
+        self._deleted: Dict[str, float] = {}
+        # same for everything, from the last clear()
+        self._cleared_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_a: str, user_b: str) -> Optional[dict]:
+        key = pair_key(user_a, user_b)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user_a: str, user_b: str, value: dict, started: float):
+        """
+        value: {"common_availabilities", "preferences": {email: pref}, "versions": {email: version}}
+        started: time.monotonic() when the fetch that produced `value` began
+        """
+        if self.max_entries <= 0 or started <= self._cleared_at:
+            return
+        versions = value.get("versions", {})
+        for email in (user_a, user_b):
+            floor = self._floor.get(email)
+            if floor is not None and (versions.get(email) or 0) < floor:
+                return
+            if started <= self._deleted.get(email, float("-inf")):
+                return
+        key = pair_key(user_a, user_b)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        for email in key:
+            self._by_user.setdefault(email, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def evict_user(self, email: str, version: Optional[int] = None) -> int:
+        """
+        Drops entries built from an older availability version of `email` (all of them when
+        version is None, e.g. on delete). Returns how many entries were evicted.
+        """
+        if version is None:
+            # a re-created user starts again at version 1, so the floor goes and a marker replaces it
+            self._floor.pop(email, None)
+            if len(self._deleted) >= 10 * max(self.max_entries, 1):
+                self._deleted.clear()
+                self._cleared_at = time.monotonic()
+            self._deleted[email] = time.monotonic()
+        else:
+            if len(self._floor) >= 10 * max(self.max_entries, 1):
+                self._floor.clear()
+            self._floor[email] = max(version, self._floor.get(email, 0))
+        evicted = 0
+        for key in list(self._by_user.get(email, ())):
+            entry = self._entries.get(key)
+            cached_version = entry[1].get("versions", {}).get(email) if entry else None
+            if version is None or cached_version is None or cached_version < version:
+                self._drop(key)
+                evicted += 1
+        return evicted
+
+    def _drop(self, key: Tuple[str, str]):
+        if self._entries.pop(key, None) is not None:
+            self.evictions += 1
+        for email in key:
+            keys = self._by_user.get(email)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[email]
+
+    def clear(self):
+        self._entries.clear()
+        self._by_user.clear()
+        self._floor.clear()
+        self._deleted.clear()
+        self._cleared_at = time.monotonic()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
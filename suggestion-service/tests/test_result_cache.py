@@ -0,0 +1,44 @@
+"""
+A pair answer fetched before one of its users was deleted must not be cached afterwards. Runs
+without any services:
+
+    cd suggestion-service && python -m pytest -q tests
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.result_cache import SuggestionCache  # noqa: E402
+
+
+def candidates(version_a, version_b):
+    return {
+        "common_availabilities": {"monday": [9]},
+        "preferences": {"a@x.com": "first", "b@x.com": "first"},
+        "versions": {"a@x.com": version_a, "b@x.com": version_b},
+    }
+
+
+def test_put_from_before_a_delete_is_dropped():
+    cache = SuggestionCache(max_entries=10, ttl_seconds=60)
+    cache.evict_user("a@x.com", 3)
+
+    # the fetch starts, then a@x.com is deleted while it is in flight
+    started = time.monotonic()
+    cache.evict_user("a@x.com")
+    cache.put("a@x.com", "b@x.com", candidates(3, 1), started)
+    assert cache.get("a@x.com", "b@x.com") is None
+
+    # re-created at version 1, fetched after the delete: cached again despite the old floor of 3
+    cache.put("b@x.com", "a@x.com", candidates(1, 1), time.monotonic())
+    assert cache.get("a@x.com", "b@x.com")["versions"]["a@x.com"] == 1
+
+
+def test_put_from_before_clear_is_dropped():
+    cache = SuggestionCache(max_entries=10, ttl_seconds=60)
+    started = time.monotonic()
+    cache.clear()
+    cache.put("a@x.com", "b@x.com", candidates(1, 1), started)
+    assert cache.get("a@x.com", "b@x.com") is None
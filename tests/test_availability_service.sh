@@ -103,4 +103,66 @@ done
 
 pass "common availability matches expected values"
 
+echo "== availability-service group availability =="
+group_payload="$(jq -n --arg u1 "$USER1" --arg u2 "$USER2" '{emails:[$u1,$u2], min_users:1}')"
+http_code="$(curl -s -o /tmp/group.json -w "%{http_code}" \
+  -H "Content-Type: application/json" \
+  -H "Case-ID: $CID" \
+  -d "$group_payload" \
+  "$AVAIL_BASE/availabilities/group")"
+body="$(cat /tmp/group.json)"
+
+assert_status "$http_code" "200"
+assert_json_field_equals "$body" '.users' "2"
+assert_json_field_equals "$body" '.common_availabilities.monday | tostring' "[9,10,11]"
+assert_json_field_equals "$body" '.best_coverage.hours.tuesday[0].free' "2"
+pass "group availability intersects all users and reports coverage"
+
+echo "== availability-service partial group availability =="
+ghost="ghost_$(date +%s)@example.com"
+group_payload="$(jq -n --arg u1 "$USER1" --arg u2 "$USER2" --arg g "$ghost" '{emails:[$u1,$g,$u2], allow_partial:true}')"
+http_code="$(curl -s -o /tmp/group_partial.json -w "%{http_code}" \
+  -H "Content-Type: application/json" \
+  -H "Case-ID: $CID" \
+  -d "$group_payload" \
+  "$AVAIL_BASE/availabilities/group")"
+body="$(cat /tmp/group_partial.json)"
+
+assert_status "$http_code" "200"
+assert_json_field_equals "$body" '.users' "2"
+assert_json_field_equals "$body" '.partial' "true"
+assert_json_field_equals "$body" '.missing[0]' "$ghost"
+assert_json_field_equals "$body" '.common_availabilities.monday | tostring' "[9,10,11]"
+
+group_payload="$(jq -n --arg u1 "$USER1" --arg g "$ghost" '{emails:[$u1,$g]}')"
+http_code="$(curl -s -o /tmp/group_missing.json -w "%{http_code}" \
+  -H "Content-Type: application/json" \
+  -H "Case-ID: $CID" \
+  -d "$group_payload" \
+  "$AVAIL_BASE/availabilities/group")"
+assert_status "$http_code" "404"
+pass "partial groups report missing users; strict groups still 404"
+
+echo "== availability-service minute intervals with duration =="
+http_code="$(curl -s -o /tmp/intervals.json -w "%{http_code}" \
+  -H "Case-ID: $CID" \
+  "$AVAIL_BASE/availabilities?userId1=$USER1&userId2=$USER2&duration=90")"
+body="$(cat /tmp/intervals.json)"
+
+assert_status "$http_code" "200"
+assert_json_field_equals "$body" '.common_intervals.monday | tostring' "[[540,720]]"
+assert_json_field_equals "$body" '.common_intervals.tuesday | tostring' "[]"
+pass "common intervals merge whole hours and drop gaps shorter than the duration"
+
+echo "== availability-service conditional GET =="
+etag="$(curl -s -D - -o /dev/null "$AVAIL_BASE/availabilities?userId1=$USER1&userId2=$USER2" | tr -d '\r' | awk 'tolower($1)=="etag:" {print $2}')"
+[[ -n "$etag" ]] || { echo "GET /availabilities sent no ETag"; exit 1; }
+http_code="$(curl -s -o /dev/null -w "%{http_code}" -H "If-None-Match: $etag" \
+  "$AVAIL_BASE/availabilities?userId1=$USER1&userId2=$USER2")"
+assert_status "$http_code" "304"
+http_code="$(curl -s -o /dev/null -w "%{http_code}" -H "If-None-Match: $etag" \
+  "$AVAIL_BASE/availabilities?userId1=$USER1&userId2=$USER2&intervals=true")"
+assert_status "$http_code" "200"
+pass "common availability answers 304 while both users and the query are unchanged"
+
 echo "ALL availability-service tests passed."
@@ -20,4 +20,20 @@ if [[ "$body" != "ok" && "$body" != "OK" ]]; then
 fi
 pass "gateway /health ok"
 
+echo "== service metrics through the gateway =="
+for svc in users availability suggestion worker; do
+  http_code="$(curl -s -o /tmp/gw_metrics.txt -w "%{http_code}" "$BASE_URL/$svc/metrics")"
+  assert_status "$http_code" "200"
+  if ! grep -q '^http_request_duration_seconds_bucket' /tmp/gw_metrics.txt; then
+    echo "Expected request latency histogram in /$svc/metrics"
+    exit 1
+  fi
+done
+pass "every service exposes Prometheus metrics"
+
+echo "== availability replicas behind the gateway =="
+replicas="$(for _ in $(seq 1 12); do curl -s "$BASE_URL/availability/cache/stats" | jq -r '.replica'; done | sort -u)"
+[[ -n "$replicas" && "$replicas" != "null" ]] || { echo "availability /cache/stats did not name its replica"; exit 1; }
+pass "gateway reaches $(echo "$replicas" | wc -l | tr -d ' ') availability replica(s)"
+
 echo "ALL gateway tests passed."
@@ -40,6 +40,35 @@ if [[ "$http_code" == "200" ]]; then
 
   pass "suggestion matches expected first common availability slot"
 
+  http_code="$(curl -s -o /tmp/suggestion_duration.json -w "%{http_code}" \
+    -H "Case-ID: $CID" \
+    "$BASE_URL/suggestions?userId1=$USER1&userId2=$USER2&duration=90")"
+  body="$(cat /tmp/suggestion_duration.json)"
+  assert_status "$http_code" "200"
+  assert_json_field_equals "$body" '.suggestions[0].start' "09:00"
+  assert_json_field_equals "$body" '.suggestions[0].end' "10:30"
+  pass "suggestion honours a 90 minute duration"
+
+  http_code="$(curl -s -o /tmp/suggestion_topk.json -w "%{http_code}" \
+    -H "Case-ID: $CID" \
+    "$BASE_URL/suggestions?userId1=$USER1&userId2=$USER2&k=2&policy=latest")"
+  body="$(cat /tmp/suggestion_topk.json)"
+  assert_status "$http_code" "200"
+  assert_json_field_equals "$body" '.suggestions | length' "2"
+  assert_json_field_equals "$body" '.suggestions[0] | tostring' '{"day":"monday","slot":[11,12]}'
+  pass "ranked suggestions return the k latest slots"
+
+  echo "== concurrent duplicate suggestions =="
+  for i in $(seq 1 10); do
+    if (( i % 2 )); then q="userId1=$USER1&userId2=$USER2"; else q="userId1=$USER2&userId2=$USER1"; fi
+    curl -s -o /dev/null -w "%{http_code}\n" -H "Case-ID: $CID" "$BASE_URL/suggestions?$q&duration=30" &
+  done > /tmp/suggestion_dupes.txt
+  wait
+  [[ "$(sort -u /tmp/suggestion_dupes.txt)" == "200" ]] || { echo "duplicate requests failed: $(cat /tmp/suggestion_dupes.txt)"; exit 1; }
+  body="$(curl -s "$BASE_URL/cache/stats")"
+  assert_json_has_field "$body" '.single_flight.coalesced'
+  pass "concurrent duplicates in either user order all succeed; coalescing is counted"
+
 else
   echo " suggestions returned HTTP $http_code (expected if USER2 isn't created yet)"
   echo "Response: $body"
@@ -50,4 +50,96 @@ assert_json_field_equals "$body" '.email' "$EMAIL"
 assert_json_has_field "$body" '.availabilities.monday'
 pass "user-service cache-aside endpoint returns availability"
 
+echo "== user-service batch availability lookup =="
+MISSING_EMAIL="ghost_batch_$(date +%s)@example.com"
+batch_payload="$(jq -n --arg e1 "$EMAIL" --arg e2 "$MISSING_EMAIL" '{emails:[$e1,$e2]}')"
+http_code="$(curl -s -o /tmp/user_batch.json -w "%{http_code}" \
+  -H "Content-Type: application/json" \
+  -H "Case-ID: $CID" \
+  -d "$batch_payload" \
+  "$BASE_URL/user-avail/batch")"
+body="$(cat /tmp/user_batch.json)"
+assert_status "$http_code" "200"
+assert_has_user=".users[\"$EMAIL\"].availabilities.monday"
+assert_json_has_field "$body" "$assert_has_user"
+assert_json_field_equals "$body" '.missing[0]' "$MISSING_EMAIL"
+pass "user-service batch lookup returns found users and reports missing ones"
+
+echo "== user-service availability search =="
+http_code="$(curl -s -o /tmp/user_free_at.json -w "%{http_code}" \
+  -H "Case-ID: $CID" \
+  "$BASE_URL/user-avail/free-at?day=monday&hour=9")"
+body="$(cat /tmp/user_free_at.json)"
+assert_status "$http_code" "200"
+assert_json_field_equals "$body" '.slot' "9"
+assert_json_has_field "$body" "any(.users[]; . == \"$EMAIL\")"
+pass "user-service free-at finds users free at a given hour"
+
+http_code="$(curl -s -o /tmp/user_overlaps.json -w "%{http_code}" \
+  -H "Case-ID: $CID" \
+  "$BASE_URL/user-avail/overlaps?email=$EMAIL")"
+body="$(cat /tmp/user_overlaps.json)"
+assert_status "$http_code" "200"
+assert_json_field_equals "$body" '.free_hours' "4"
+assert_json_has_field "$body" '.overlaps'
+pass "user-service overlaps returns users sharing free hours"
+
+echo "== user-service partial availability update =="
+http_code="$(curl -s -o /tmp/user_patch.json -w "%{http_code}" \
+  -X PATCH \
+  -H "Content-Type: application/json" \
+  -H "Case-ID: $CID" \
+  -d '{"add":{"friday":[8,9]},"remove":{"friday":[9]}}' \
+  "$BASE_URL/users/$EMAIL/availabilities")"
+assert_status "$http_code" "400"
+http_code="$(curl -s -o /tmp/user_patch.json -w "%{http_code}" \
+  -X PATCH \
+  -H "Content-Type: application/json" \
+  -H "Case-ID: $CID" \
+  -d '{"add":{"friday":[8,9]}}' \
+  "$BASE_URL/users/$EMAIL/availabilities")"
+body="$(cat /tmp/user_patch.json)"
+assert_status "$http_code" "200"
+assert_json_field_equals "$body" '.availabilities.friday | join(",")' "8,9"
+body="$(curl -s -H "Case-ID: $CID" "$BASE_URL/users/$EMAIL")"
+assert_json_field_equals "$body" '.availabilities.friday | join(",")' "8,9"
+assert_json_field_equals "$body" '.availabilities.monday | join(",")' "9,10,11"
+curl -s -o /dev/null -X PATCH -H "Content-Type: application/json" \
+  -d '{"remove":{"friday":[8,9]}}' "$BASE_URL/users/$EMAIL/availabilities"
+pass "user-service PATCH adds/removes hours on single days"
+
+echo "== user-service bulk import and export =="
+BULK_A="bulk_a_$(date +%s)@example.com"
+BULK_B="bulk_b_$(date +%s)@example.com"
+bulk_body="$(jq -cn --arg e "$BULK_A" '{email:$e, availabilities:{monday:[9,10]}}')
+not json
+$(jq -cn --arg e "$BULK_B" '{email:$e, availabilities:{tuesday:[14]}}')"
+http_code="$(curl -s -o /tmp/user_bulk.json -w "%{http_code}" \
+  -H "Content-Type: application/x-ndjson" \
+  -H "Case-ID: $CID" \
+  --data-binary "$bulk_body" \
+  "$BASE_URL/users/bulk")"
+body="$(cat /tmp/user_bulk.json)"
+assert_status "$http_code" "200"
+assert_json_field_equals "$body" '.inserted' "2"
+assert_json_field_equals "$body" '.rejected' "1"
+assert_json_field_equals "$body" '.errors[0].line' "2"
+pass "user-service bulk import upserts valid rows and reports the rest"
+
+curl -s -H "Case-ID: $CID" "$BASE_URL/users/export?format=csv" > /tmp/user_export.csv
+grep -q "^$BULK_B,first,.*,14," /tmp/user_export.csv || { echo "export is missing $BULK_B"; exit 1; }
+pass "user-service export streams imported users as CSV"
+
+echo "== user-service conditional GET =="
+etag="$(curl -s -D - -o /dev/null -H "Case-ID: $CID" "$BASE_URL/users/$EMAIL" | tr -d '\r' | awk 'tolower($1)=="etag:" {print $2}')"
+[[ -n "$etag" ]] || { echo "GET /users/$EMAIL sent no ETag"; exit 1; }
+http_code="$(curl -s -o /dev/null -w "%{http_code}" -H "If-None-Match: $etag" "$BASE_URL/users/$EMAIL")"
+assert_status "$http_code" "304"
+body="$(curl -s -H "Content-Type: application/json" \
+  -d "$(jq -cn --arg e "$EMAIL" --arg t "$etag" '{emails:[$e], known_etags:{($e):$t}}')" \
+  "$BASE_URL/user-avail/batch")"
+assert_json_field_equals "$body" '.not_modified[0]' "$EMAIL"
+assert_json_field_equals "$body" '.users | length' "0"
+pass "user-service answers 304 and not_modified for an unchanged user"
+
 echo "ALL user-service tests passed."
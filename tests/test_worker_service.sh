@@ -34,5 +34,55 @@ assert_json_field_equals "$body" '.status' "enqueued"
 assert_json_has_field "$body" '.job_id'
 pass "worker-service POST /tasks enqueues job"
 
-echo "NOTE: check worker logs for JOB_DONE printing suggestion result."
+job_id="$(echo "$body" | jq -r '.job_id')"
+
+echo "== worker-service job status =="
+http_code="$(curl -s -o /tmp/worker_job.json -w "%{http_code}" \
+  -H "Case-ID: $CID" \
+  "$BASE_URL/tasks/$job_id/wait?timeout=10")"
+body="$(cat /tmp/worker_job.json)"
+assert_status "$http_code" "200"
+assert_json_field_equals "$body" '.job_id' "$job_id"
+assert_json_has_field "$body" '.status'
+pass "worker-service GET /tasks/{job_id}/wait returns the job"
+
+http_code="$(curl -s -o /tmp/worker_jobs.json -w "%{http_code}" \
+  -H "Content-Type: application/json" \
+  -H "Case-ID: $CID" \
+  -d "$(jq -n --arg id "$job_id" '{job_ids:[$id, "no-such-job"]}')" \
+  "$BASE_URL/tasks/status")"
+body="$(cat /tmp/worker_jobs.json)"
+assert_status "$http_code" "200"
+assert_json_has_field "$body" ".jobs[\"$job_id\"]"
+assert_json_field_equals "$body" '.missing[0]' "no-such-job"
+pass "worker-service POST /tasks/status reports found and missing jobs"
+
+http_code="$(curl -s -o /dev/null -w "%{http_code}" -H "Case-ID: $CID" "$BASE_URL/tasks/no-such-job")"
+assert_status "$http_code" "404"
+pass "worker-service GET /tasks/{job_id} returns 404 for unknown jobs"
+
+echo "== worker-service bulk enqueue =="
+http_code="$(curl -s -o /tmp/worker_batch.json -w "%{http_code}" \
+  -H "Content-Type: application/x-ndjson" \
+  -H "Case-ID: $CID" \
+  --data-binary "$(printf '%s\n%s\n' "$payload" "$payload" | jq -c .)" \
+  "$BASE_URL/tasks/batch")"
+body="$(cat /tmp/worker_batch.json)"
+assert_status "$http_code" "202"
+assert_json_field_equals "$body" '.enqueued' "2"
+assert_json_field_equals "$body" '.job_ids | length' "2"
+pass "worker-service POST /tasks/batch enqueues NDJSON tasks"
+
+echo "== worker-service job result =="
+http_code="$(curl -s -o /tmp/worker_job.json -w "%{http_code}" -H "Case-ID: $CID" "$BASE_URL/tasks/$job_id")"
+body="$(cat /tmp/worker_job.json)"
+assert_status "$http_code" "200"
+assert_json_has_field "$body" '.status == "done" or .status == "failed"'
+if [[ "$(echo "$body" | jq -r '.status')" == "done" ]]; then
+  assert_json_has_field "$body" '.result'
+else
+  assert_json_has_field "$body" '.error'
+fi
+pass "worker-service GET /tasks/{job_id} returns the finished job with its result"
+
 echo "ALL worker-service tests passed."
@@ -0,0 +1,171 @@
+"""
+Per-request critical-path breakdown from the span files the services write to TRACE_DIR.
+
+Every service appends its finished spans to `<TRACE_DIR>/<service>.jsonl` with the Case-ID as
+the trace id, so one request through worker -> suggestion -> availability -> user -> Redis/Postgres
+is one trace spread over several files. This joins them and prints, per trace:
+
+- the span tree with each span's duration;
+- the critical path: from the root, repeatedly take the child that finishes last, then the
+  latest one finishing before it started, and so on. The time a span spends outside its
+  critical children is its self time. Self times along the path add up to the trace's duration.
+- how that critical time splits across services.
+
+    python tools/trace_report.py                          # the 5 slowest traces
+    python tools/trace_report.py --case-id 3f2a...        # one request
+    python tools/trace_report.py --slowest 20 --dir ./traces
+
+Needs only the standard library.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import defaultdict
+
+# overlapping clocks across containers can be off by a little; treat this much as "touching"
+EPSILON_S = 0.0005
+
+
+def load_spans(directory):
+    traces = defaultdict(dict)
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                span["end"] = span["start"] + span["duration_ms"] / 1000
+                traces[span["trace_id"]][span["span_id"]] = span
+    return traces
+
+
+class Trace:
+    def __init__(self, trace_id, spans):
+        self.trace_id = trace_id
+        self.spans = spans
+        self.children = defaultdict(list)
+        roots = []
+        for span in spans.values():
+            if span.get("parent_id") in spans:
+                self.children[span["parent_id"]].append(span)
+            else:
+                roots.append(span)
+        for kids in self.children.values():
+            kids.sort(key=lambda s: s["start"])
+        roots.sort(key=lambda s: s["start"])
+        self.start = min(s["start"] for s in spans.values())
+        self.end = max(s["end"] for s in spans.values())
+        if len(roots) == 1:
+            self.root = roots[0]
+        else:
+            # e.g. the caller's span lives in a file we don't have: hang the pieces off one root
+            self.root = {
+                "span_id": None, "service": "-", "name": "(trace)",
+                "start": self.start, "end": self.end, "duration_ms": (self.end - self.start) * 1000,
+            }
+            self.children[None] = roots
+        self._ends = {}
+
+    @property
+    def duration_ms(self):
+        return (self.end - self.start) * 1000
+
+    def effective_end(self, span):
+        # async work (a queued job) can outlive the span that started it
+        key = span["span_id"]
+        if key not in self._ends:
+            self._ends[key] = max([span["end"]] + [self.effective_end(c) for c in self.children[key]])
+        return self._ends[key]
+
+    def critical_path(self, span=None):
+        """
+        returns: [(span, self_ms)] in the order the work happened
+        """
+        span = span or self.root
+        cursor = self.effective_end(span)
+        chosen = []
+        for child in sorted(self.children[span["span_id"]], key=self.effective_end, reverse=True):
+            if self.effective_end(child) <= cursor + EPSILON_S:
+                chosen.append(child)
+                cursor = child["start"]
+        chosen.reverse()
+        covered = sum(
+            min(self.effective_end(c), self.effective_end(span)) - max(c["start"], span["start"]) for c in chosen
+        )
+        self_ms = max((self.effective_end(span) - span["start"] - covered) * 1000, 0.0)
+        path = [(span, self_ms)]
+        for child in chosen:
+            path.extend(self.critical_path(child))
+        return path
+
+    def walk(self, span=None, depth=0):
+        span = span or self.root
+        yield depth, span
+        for child in self.children[span["span_id"]]:
+            yield from self.walk(child, depth + 1)
+
+
+def label(span):
+    status = (span.get("attrs") or {}).get("status")
+    error = (span.get("attrs") or {}).get("error")
+    suffix = f" [{status}]" if status is not None else ""
+    return f"{span['name']}{suffix}{' !' + error if error else ''}"
+
+
+def report(trace, max_depth):
+    total = trace.duration_ms or 1e-9
+    services = sorted({s["service"] for s in trace.spans.values()})
+    print(f"trace {trace.trace_id}  total={trace.duration_ms:.2f} ms  spans={len(trace.spans)}  services={', '.join(services)}")
+
+    print("  tree:")
+    for depth, span in trace.walk():
+        if max_depth is not None and depth > max_depth:
+            continue
+        offset = (span["start"] - trace.start) * 1000
+        print(f"    {'  ' * depth}{span['service']:<22} {label(span):<48} +{offset:8.2f} {span['duration_ms']:9.2f} ms")
+
+    print("  critical path (self time):")
+    by_service = defaultdict(float)
+    for span, self_ms in trace.critical_path():
+        if self_ms < 0.01:
+            continue
+        by_service[span["service"]] += self_ms
+        print(f"    {self_ms:9.2f} ms {self_ms / total * 100:5.1f}%  {span['service']:<22} {label(span)}")
+
+    print("  by service:")
+    for service, ms in sorted(by_service.items(), key=lambda kv: -kv[1]):
+        print(f"    {service:<22} {ms:9.2f} ms {ms / total * 100:5.1f}%")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.getenv("TRACE_DIR", "traces"), help="directory holding <service>.jsonl span files")
+    parser.add_argument("--case-id", help="report this trace only")
+    parser.add_argument("--slowest", type=int, default=5, help="report the N slowest traces")
+    parser.add_argument("--max-depth", type=int, help="limit the printed tree depth")
+    args = parser.parse_args()
+
+    spans = load_spans(args.dir)
+    if not spans:
+        sys.exit(f"no spans found in {args.dir}")
+
+    if args.case_id:
+        if args.case_id not in spans:
+            sys.exit(f"no spans for Case-ID {args.case_id}")
+        traces = [Trace(args.case_id, spans[args.case_id])]
+    else:
+        traces = sorted((Trace(tid, s) for tid, s in spans.items()), key=lambda t: -t.duration_ms)[: args.slowest]
+
+    for trace in traces:
+        report(trace, args.max_depth)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+from app.metrics import timed
+
+# Single cache schema for user records: one Redis hash per user at `user:{email}` with
+# scalar fields plus one `avail:{day}` field per weekday (JSON list of hours). Minute-level
+# intervals, date overrides and exceptions, when a user has them, are JSON fields of their own.
+# Every entry carries the same TTL, so stale records age out even if an invalidation is missed.
+KEY_PREFIX = "user:"
+AVAIL_PREFIX = "avail:"
+INTERVAL_FIELDS = ("intervals", "overrides", "exceptions")
+# services holding their own copies of user records (availability-service L1) subscribe here
+INVALIDATION_CHANNEL = os.getenv("USER_INVALIDATION_CHANNEL", "user-avail-invalidate")
+
+
+# Writers that drop an entry leave a tombstone in its place for TOMBSTONE_SECONDS: a hash with
+# only a `tombstone` field, "deleted" or the lowest version a read may cache. It reads as a miss,
+# but stops a read that loaded the row before the write from putting the old record back.
+TOMBSTONE_SECONDS = int(os.getenv("TOMBSTONE_SECONDS", 30))
+
+# Applies a partial availability update in place: only the changed `avail:{day}` fields and the
+# version are written, and only when the entry is exactly one version behind the database.
+# An entry that is missing, newer, or missed an update is replaced by a tombstone for the new
+# version, so the next read refills it. The change is published either way. One round trip,
+# atomic on the server.
+PATCH_SCRIPT = """
+local cached = redis.call('HGET', KEYS[1], 'version')
+local applied = 0
+if cached and tonumber(cached) == tonumber(ARGV[1]) - 1 then
+  redis.call('HSET', KEYS[1], 'version', ARGV[1], unpack(ARGV, 6))
+  redis.call('EXPIRE', KEYS[1], ARGV[2])
+  applied = 1
+else
+  redis.call('DEL', KEYS[1])
+  redis.call('HSET', KEYS[1], 'tombstone', ARGV[1])
+  redis.call('EXPIRE', KEYS[1], ARGV[5])
+end
+redis.call('PUBLISH', ARGV[3], ARGV[4])
+return applied
+"""
+
+# Read-through backfill of a record loaded from Postgres. It only writes when nothing newer got
+# there first: no entry at all, an older version of the same user (same created_at), or a
+# tombstone the version has reached. A "deleted" tombstone, a newer or equal version, or a
+# re-created user (other created_at) win over the loaded row.
+# KEYS[1] entry; ARGV: version, created_at, ttl, field, value, ...
+FILL_SCRIPT = """
+local current = redis.call('HMGET', KEYS[1], 'version', 'created_at', 'tombstone')
+local version = tonumber(ARGV[1])
+if current[3] then
+  if current[3] == 'deleted' or version < tonumber(current[3]) then
+    return 0
+  end
+elseif current[1] then
+  if current[2] ~= ARGV[2] or tonumber(current[1]) >= version then
+    return 0
+  end
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+# Write-through for writers (create, PUT, bulk import): replaces the entry only when nothing newer
+# is there, i.e. no tombstone and no cached version at or above this one, so when two writes'
+# Redis calls land in the opposite order of their commits the later version stays cached.
+# The change is published either way.
+# KEYS[1] entry; ARGV: version, ttl, channel, message ('' for none), field, value, ...
+SET_SCRIPT = """
+local current = redis.call('HMGET', KEYS[1], 'version', 'tombstone')
+local written = 0
+if not current[2] and (not current[1] or tonumber(current[1]) < tonumber(ARGV[1])) then
+  redis.call('DEL', KEYS[1])
+  redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+  redis.call('EXPIRE', KEYS[1], ARGV[2])
+  written = 1
+end
+if ARGV[4] ~= '' then
+  redis.call('PUBLISH', ARGV[3], ARGV[4])
+end
+return written
+"""
+
+
+def cache_key(email: str) -> str:
+    return f"{KEY_PREFIX}{email}"
+
+
+def encode_record(record: dict) -> Dict[str, str]:
+    fields = {
+        "email": record["email"],
+        "preferences": record.get("preferences") or "first",
+        "created_at": record.get("created_at") or "",
+        "version": record.get("version") or 1,
+    }
+    for day, hours in (record.get("availabilities") or {}).items():
+        fields[f"{AVAIL_PREFIX}{day}"] = json.dumps(hours)
+    for name in INTERVAL_FIELDS:
+        if record.get(name) is not None:
+            fields[name] = json.dumps(record[name])
+    return fields
+
+
+def decode_record(fields: Dict[str, str]) -> Optional[dict]:
+    # hashes written before the unified schema stored one JSON "availabilities" field
+    # and never expired; report them as misses so they get rewritten with a TTL
+    if not fields or "email" not in fields or "availabilities" in fields:
+        return None
+    return {
+        "email": fields["email"],
+        "preferences": fields.get("preferences", "first"),
+        "availabilities": {
+            name[len(AVAIL_PREFIX):]: json.loads(value)
+            for name, value in fields.items()
+            if name.startswith(AVAIL_PREFIX)
+        },
+        "created_at": fields.get("created_at") or None,
+        "version": int(fields.get("version", 1)),
+        **{name: json.loads(fields[name]) if name in fields else None for name in INTERVAL_FIELDS},
+    }
+
+
+class UserCache:
+    """
+    Write-through cache for user records in front of Postgres.
+    Reads go through get/get_many, writes through set/set_many, deletes through invalidate.
+    Read-through backfills go through fill/fill_many. Neither writes over a newer version.
+    """
+
+    def __init__(self, redis_client, ttl_seconds: int):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._patch = redis_client.register_script(PATCH_SCRIPT)
+        self._fill = redis_client.register_script(FILL_SCRIPT)
+        self._set = redis_client.register_script(SET_SCRIPT)
+        self.fills_skipped = 0
+        self.writes_skipped = 0
+
+    async def get(self, email: str) -> Optional[dict]:
+        with timed("redis", "user_get"):
+            fields = await self.redis.hgetall(cache_key(email))
+        record = decode_record(fields)
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    async def get_many(self, emails: List[str]) -> Dict[str, dict]:
+        pipe = self.redis.pipeline(transaction=False)
+        for email in emails:
+            pipe.hgetall(cache_key(email))
+        with timed("redis", "user_get_many"):
+            rows = await pipe.execute()
+        found = {}
+        for email, fields in zip(emails, rows):
+            record = decode_record(fields)
+            if record is not None:
+                found[email] = record
+        self.hits += len(found)
+        self.misses += len(emails) - len(found)
+        return found
+
+    def _set_args(self, record: dict, event: Optional[str]) -> list:
+        # the whole hash is replaced so days dropped from availabilities don't linger
+        fields = encode_record(record)
+        message = json.dumps({"email": record["email"], "event": event, "version": record.get("version")}) if event else ""
+        args = [fields["version"], self.ttl_seconds, INVALIDATION_CHANNEL, message]
+        for name, value in fields.items():
+            args.extend((name, value))
+        return args
+
+    def _queue_publish(self, pipe, email: str, event: str, version: Optional[int] = None):
+        pipe.publish(INVALIDATION_CHANNEL, json.dumps({"email": email, "event": event, "version": version}))
+
+    async def set(self, record: dict, event: Optional[str] = None) -> bool:
+        """
+        Writes the record unless a newer version or a tombstone is cached (see SET_SCRIPT); pass
+        `event` when it replaces existing data so subscribers drop their copies.
+        returns: whether it was written
+        """
+        with timed("redis", "user_set"):
+            written = await self._set(keys=[cache_key(record["email"])], args=self._set_args(record, event))
+        self.writes_skipped += not written
+        return bool(written)
+
+    async def set_many(self, records: Iterable[dict], event: Optional[str] = None):
+        records = list(records)
+        if not records:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for record in records:
+            await self._set(keys=[cache_key(record["email"])], args=self._set_args(record, event), client=pipe)
+        with timed("redis", "user_set_many"):
+            written = await pipe.execute()
+        self.writes_skipped += sum(not w for w in written)
+
+    def _fill_args(self, record: dict) -> list:
+        fields = encode_record(record)
+        args = [fields["version"], fields["created_at"], self.ttl_seconds]
+        for name, value in fields.items():
+            args.extend((name, value))
+        return args
+
+    async def fill(self, record: dict) -> bool:
+        """
+        Caches a record read from Postgres unless a write got there first (see FILL_SCRIPT).
+        returns: whether it was written
+        """
+        with timed("redis", "user_fill"):
+            written = await self._fill(keys=[cache_key(record["email"])], args=self._fill_args(record))
+        self.fills_skipped += not written
+        return bool(written)
+
+    async def fill_many(self, records: Iterable[dict]):
+        records = list(records)
+        if not records:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for record in records:
+            await self._fill(keys=[cache_key(record["email"])], args=self._fill_args(record), client=pipe)
+        with timed("redis", "user_fill_many"):
+            written = await pipe.execute()
+        self.fills_skipped += sum(not w for w in written)
+
+    async def patch_days(
+        self, email: str, version: int, days: Dict[str, List[int]],
+        intervals: Optional[dict] = None, event: str = "update",
+    ) -> bool:
+        """
+        Writes the given days' hours, and the user's new weekly intervals if they have any, into
+        the cached entry for `version` (see PATCH_SCRIPT).
+        returns: whether the entry was patched (False: it was dropped instead)
+        """
+        fields = []
+        for day, hours in days.items():
+            fields.extend((f"{AVAIL_PREFIX}{day}", json.dumps(hours)))
+        if intervals:
+            fields.extend(("intervals", json.dumps(intervals)))
+        message = json.dumps({"email": email, "event": event, "version": version})
+        with timed("redis", "user_patch"):
+            applied = await self._patch(
+                keys=[cache_key(email)],
+                args=[version, self.ttl_seconds, INVALIDATION_CHANNEL, message, TOMBSTONE_SECONDS, *fields],
+            )
+        return bool(applied)
+
+    async def invalidate(self, email: str, event: str = "delete"):
+        key = cache_key(email)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, "tombstone", "deleted")
+        pipe.expire(key, TOMBSTONE_SECONDS)
+        self._queue_publish(pipe, email, event)
+        with timed("redis", "user_invalidate"):
+            await pipe.execute()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+            "fills_skipped": self.fills_skipped,
+            "writes_skipped": self.writes_skipped,
+        }
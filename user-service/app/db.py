@@ -1,19 +1,69 @@
 from pydantic import field_validator
-from sqlmodel import SQLModel, Field, create_engine
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy import Column, DateTime, String
+from sqlmodel import SQLModel, Field
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.dialects.postgresql import ARRAY, BIT, JSONB
+from sqlalchemy import Column, DateTime, Integer, SmallInteger, String
 from datetime import datetime
 import os
 from dotenv import load_dotenv
-from typing import Literal, List, Dict
+from typing import Literal, List, Dict, Optional
 
 load_dotenv()
 
 # Load the Postgres DSN (connection string) from environment variables
 PG_DSN = os.getenv("PG_DSN")
 
-# Create the SQLAlchemy engine that connects to your database
-engine = create_engine(PG_DSN)
+
+def async_dsn(dsn: str) -> str:
+    # the .env DSN is a plain postgresql:// URL; the async engine needs the asyncpg driver
+    if dsn.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + dsn[len("postgresql://"):]
+    if dsn.startswith("postgres://"):
+        return "postgresql+asyncpg://" + dsn[len("postgres://"):]
+    return dsn
+
+
+# Create the async SQLAlchemy engine; pool sizes are tuned through env so the service keeps
+# a bounded number of warm connections instead of opening one per request
+ASYNC_PG_DSN = async_dsn(PG_DSN)
+POOL_OPTIONS = {} if ASYNC_PG_DSN.startswith("sqlite") else {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 5)),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+}
+engine = create_async_engine(ASYNC_PG_DSN, pool_pre_ping=True, **POOL_OPTIONS)
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def normalize_intervals(intervals, label: str) -> List[List[int]]:
+    """
+    Validates [start, end) minute pairs within one day and returns them sorted and merged.
+    """
+    if not isinstance(intervals, list):
+        raise ValueError(f"Intervals for '{label}' must be a list of [start, end] pairs.")
+    pairs = []
+    for interval in intervals:
+        if not (isinstance(interval, (list, tuple)) and len(interval) == 2 and all(isinstance(m, int) for m in interval)):
+            raise ValueError(f"Intervals for '{label}' must be [start, end] pairs of integer minutes.")
+        start, end = interval
+        if not 0 <= start < end <= MINUTES_PER_DAY:
+            raise ValueError(f"Intervals for '{label}' must satisfy 0 <= start < end <= {MINUTES_PER_DAY}.")
+        pairs.append((start, end))
+    merged: List[List[int]] = []
+    for start, end in sorted(pairs):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def hours_covered(intervals: List[List[int]]) -> List[int]:
+    # whole hours fully inside the intervals, for the hour-based availabilities and avail_mask
+    return [h for h in range(24) if any(start <= h * 60 and h * 60 + 60 <= end for start, end in intervals)]
+
 
 Weekday = Literal[
     "monday",
@@ -67,13 +117,25 @@ class UserAvail(SQLModel, table=True):
             
     preferences: str=  Field(sa_column=Column(String),default='first')
     created_at: datetime = Field(sa_column=Column(DateTime, onupdate=datetime.now(), default=datetime.now()))
+    # bumped on every write so downstream caches can tell stale copies apart
+    version: int = Field(sa_column=Column(Integer, nullable=False, server_default="1"), default=1)
+    # derived from availabilities by the useravail_sync_mask trigger (initdb/003_avail_mask.sql);
+    # bit i from the left / slot i = day_index * 24 + hour. Never written by the application.
+    avail_mask: Optional[str] = Field(sa_column=Column(BIT(168)), default=None)
+    free_slots: Optional[List[int]] = Field(sa_column=Column(ARRAY(SmallInteger)), default=None)
+    # minute-level availability (initdb/004_avail_intervals.sql): weekday -> [[start, end]] minutes,
+    # plus per-date overrides (replace that day) and exceptions (blocked ranges) keyed by YYYY-MM-DD
+    weekly_intervals: Optional[Dict[str, List[List[int]]]] = Field(sa_column=Column(JSONB), default=None)
+    date_overrides: Optional[Dict[str, List[List[int]]]] = Field(sa_column=Column(JSONB), default=None)
+    date_exceptions: Optional[Dict[str, List[List[int]]]] = Field(sa_column=Column(JSONB), default=None)
 
 # create tables if they don't exist
-def init_db():
-    SQLModel.metadata.create_all(engine)
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
     print("Database initialized and tables created (if not exist).")
 
 # close the database connection cleanly
-def close_db_connection():
-    engine.dispose()
-    print("Database connection closed.")
\ No newline at end of file
+async def close_db_connection():
+    await engine.dispose()
+    print("Database connection closed.")
@@ -1,39 +1,48 @@
 from fastapi import FastAPI, HTTPException, Query, Response,status
-from pydantic import BaseModel, EmailStr
-import redis
+from pydantic import BaseModel, EmailStr, Field, ValidationError, field_validator, model_validator
+from typing import Dict, List, Literal, Optional
+import redis.asyncio as redis
 import os
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from fastapi.exceptions import RequestValidationError
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 import time
-from app.db import init_db,close_db_connection,engine
+from app.db import init_db,close_db_connection,engine,hours_covered,normalize_intervals
+from app.cache import UserCache
+from app.metrics import instrument_engine, metrics_response, observe_request, route_label, stats_collector
+from app.log_pipeline import RequestLogSampler, setup_logging
+from app.tracing import PARENT_HEADER, Tracer
 from contextlib import asynccontextmanager
 import logging
 import json
+import asyncio
+import csv
+import io
+import zlib
 from sqlalchemy import text
 
 os.makedirs("logs", exist_ok=True)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
+    await init_db()
+    exporter = asyncio.create_task(tracer.run())
     yield
-    close_db_connection()
+    exporter.cancel()
+    await asyncio.gather(exporter, return_exceptions=True)
+    await redis_client.aclose()
+    await close_db_connection()
     
 
 app = FastAPI( lifespan=lifespan)
 os.makedirs("logs", exist_ok=True)
-# this is an example that you can use
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("logs/user_log.txt", mode="a"),  # write to file
-        logging.StreamHandler()  # also show in console
-    ]
-)
+log_handler = setup_logging("user-service", "logs/user_log.txt")
+# which finished requests get a log line (errors and slow requests always do)
+request_sampler = RequestLogSampler.from_env()
+stats_collector.add_component("logging", lambda: {"dropped": log_handler.dropped, "queued": log_handler.queue.qsize()}, counters=("dropped",))
 
 logger = logging.getLogger("user-service")
 
@@ -44,21 +53,24 @@ async def add_case_id(request: Request, call_next):
     case_id = request.headers.get("Case-ID", str(uuid.uuid4()))
     request.state.case_id = case_id
     perf=time.perf_counter()
-    logger.info(
-        f"[{case_id}] Request started - "
-        f"Method={request.method} Path={request.url.path}"
-    )
+    logger.debug("[%s] Request started - Method=%s Path=%s", case_id, request.method, request.url.path)
 
     # Let FastAPI process the request
-    response = await call_next(request)
+    with tracer.span(request.url.path, trace_id=case_id, parent_id=request.headers.get(PARENT_HEADER)) as span:
+        response = await call_next(request)
+        span.rename(f"{request.method} {route_label(request)}")
+        span.set("status", response.status_code)
 
     # Add the correlation ID back to response headers
     response.headers["Case-ID"] = case_id
+    elapsed = time.perf_counter() - perf
+    observe_request(request, response.status_code, elapsed)
 
-    logger.info(
-        f"[{case_id}] Request completed - "
-        f"Status={response.status_code}, Time taken={(time.perf_counter()-perf)*1000:.2f} ms"
-    )
+    if request_sampler.keep(route_label(request), response.status_code, elapsed * 1000):
+        logger.info(
+            "[%s] Request completed - Method=%s Path=%s Status=%s, Time taken=%.2f ms",
+            case_id, request.method, request.url.path, response.status_code, elapsed * 1000,
+        )
 
     return response
 
@@ -94,12 +106,18 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         }
     )
 
-# Redis connection
+# Redis connection (asyncio client with its own connection pool)
 redis_client = redis.Redis(
     host=os.getenv("REDIS_HOST", "redis"),
     port=int(os.getenv("REDIS_PORT", 6379)),
+    max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", 50)),
     decode_responses=True
 )
+user_cache = UserCache(redis_client, ttl_seconds=int(os.getenv("TTL_SECONDS", 3300)))
+stats_collector.add_cache("user", user_cache.stats)
+instrument_engine(engine)
+tracer = Tracer("user-service")
+stats_collector.add_component("tracer", tracer.stats, counters=("exported", "dropped"))
 
 class UserAvail(BaseModel):
     id: int
@@ -109,11 +127,79 @@ class UserAvail(BaseModel):
     created_at: datetime = datetime.now()
 
 
+# slot numbering shared with the avail_mask/free_slots columns: slot = day_index * 24 + hour
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+Weekday = Literal["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def check_hours(days: Dict[str, List[int]]) -> Dict[str, List[int]]:
+    # whole hours of the day, the slots avail_mask and free_slots are built from
+    for day, hours in days.items():
+        if not all(0 <= h <= 23 for h in hours):
+            raise ValueError(f"Hours for '{day}' must be between 0 and 23 (24 hour format).")
+    return days
+
+
 # Pydantic models
 class UserCreate(BaseModel):
     email: EmailStr
-    availabilities: dict
+    availabilities: Dict[Weekday, List[int]] = Field(default_factory=dict)
     preferences: str = 'first'
+    # optional minute-level availability: [[start, end]] minutes since midnight per weekday,
+    # per-date overrides replacing that day, and per-date exceptions blocking ranges
+    intervals: Optional[Dict[Weekday, list]] = None
+    overrides: Optional[Dict[date, list]] = None
+    exceptions: Optional[Dict[date, list]] = None
+
+    @field_validator("availabilities")
+    @classmethod
+    def validate_hours(cls, v):
+        return check_hours(v)
+
+    @field_validator("intervals", "overrides", "exceptions")
+    @classmethod
+    def validate_intervals(cls, v):
+        if v is None:
+            return v
+        return {str(key): normalize_intervals(intervals, str(key)) for key, intervals in v.items()}
+
+    @model_validator(mode="after")
+    def derive_hours(self):
+        # hour-based readers (bitmask, avail_mask) still see users who only send intervals
+        if not self.availabilities and self.intervals:
+            self.availabilities = {day: hours_covered(intervals) for day, intervals in self.intervals.items()}
+        return self
+
+
+class AvailabilityPatch(BaseModel):
+    # hours to add to / remove from each listed day; days left out keep their hours
+    add: Dict[Weekday, List[int]] = Field(default_factory=dict)
+    remove: Dict[Weekday, List[int]] = Field(default_factory=dict)
+
+    @field_validator("add", "remove")
+    @classmethod
+    def validate_hours(cls, v):
+        check_hours(v)
+        return {day: sorted(set(hours)) for day, hours in v.items() if hours}
+
+    @model_validator(mode="after")
+    def check_delta(self):
+        if not self.add and not self.remove:
+            raise ValueError("Nothing to change: give hours to add and/or remove.")
+        for day, hours in self.add.items():
+            both = set(hours) & set(self.remove.get(day, []))
+            if both:
+                raise ValueError(f"Hours {sorted(both)} on '{day}' are both added and removed.")
+        return self
+
+
+class UserAvailBatch(BaseModel):
+    emails: List[str] = Field(..., min_length=1)
+    # email -> ETag of the copy the caller already holds; matching users come back in
+    # not_modified instead of with a body
+    known_etags: Dict[str, str] = Field(default_factory=dict)
+
+MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", 1000))
 
 # Endpoints
 @app.get("/health")
@@ -125,7 +211,7 @@ async def health_check(response: Response, request: Request):
     status_indicator="healthy"
     dependencies = {}
     try:
-        pong=redis_client.ping()
+        pong=await redis_client.ping()
         if pong:
             dependencies["redis"]={"status":"healthy","response_time_ms":(time.perf_counter()-start_time)*1000}
             status_indicator="healthy"
@@ -138,8 +224,8 @@ async def health_check(response: Response, request: Request):
         status_indicator="unhealthy"
 
     try:
-        with engine.connect() as conn:
-            postgres_check= conn.execute(text("SELECT 1"))
+        async with engine.connect() as conn:
+            postgres_check= await conn.execute(text("SELECT 1"))
             if postgres_check:
                 dependencies["postgresql"]={"status":"healthy","response_time_ms":(time.perf_counter()-start_time)*1000}
                 status_indicator="healthy"
@@ -172,36 +258,40 @@ async def health_check(response: Response, request: Request):
 async def create_user(user: UserCreate, request: Request):
     case_id = getattr(request.state, "case_id", "N/A")
 
-    created_at = datetime.utcnow().isoformat()
+    created_ts = datetime.utcnow()
+    created_at = created_ts.isoformat()
     user_data = {
         "email": user.email,
         "availabilities": user.availabilities,
         "preferences": user.preferences,
         "created_at": created_at,
+        "version": 1,
+        **_interval_fields(user),
     }
 
     try:
-        redis_client.hset(f"user:{user.email}", mapping={
-            "email": user.email,
-            "availabilities": json.dumps(user.availabilities),
-            "preferences": user.preferences,
-            "created_at": created_at,
-        })
-
-        with engine.begin() as conn:
-            conn.execute(
+        async with engine.begin() as conn:
+            inserted = (await conn.execute(
                 text(
-                    "INSERT INTO USERAVAIL (email, availabilities, preferences, created_at) "
-                    "VALUES (:email, :availabilities, :preferences, :created_at) "
-                    "ON CONFLICT (email) DO NOTHING"
+                    "INSERT INTO USERAVAIL (email, availabilities, preferences, created_at, "
+                    "weekly_intervals, date_overrides, date_exceptions) "
+                    "VALUES (:email, :availabilities, :preferences, :created_at, "
+                    ":weekly_intervals, :date_overrides, :date_exceptions) "
+                    "ON CONFLICT (email) DO NOTHING RETURNING email"
                 ),
                 {
                     "email": user.email,
                     "availabilities": json.dumps(user.availabilities),
                     "preferences": user.preferences,
-                    "created_at": created_at,
+                    # asyncpg binds TIMESTAMP columns from datetime objects, not ISO strings
+                    "created_at": created_ts,
+                    **_interval_params(user),
                 },
-            )
+            )).first()
+
+        # write-through only when the row is new; an existing user keeps its cached record
+        if inserted:
+            await user_cache.set(user_data)
 
         logging.info(f"[{case_id}] USER CREATE: User created with email: {user.email}")
         return user_data
@@ -210,123 +300,645 @@ async def create_user(user: UserCreate, request: Request):
         logging.error(f"[{case_id}] USER CREATE: Failed to create user with email: {user.email} err={e}")
         raise HTTPException(status_code=500, detail="Failed to create user")
 
+
+USER_COLUMNS = (
+    "email, availabilities, preferences, created_at, version, "
+    "weekly_intervals, date_overrides, date_exceptions"
+)
+
+
+def _json_column(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _interval_fields(user: UserCreate) -> dict:
+    return {"intervals": user.intervals, "overrides": user.overrides, "exceptions": user.exceptions}
+
+
+def _interval_params(user: UserCreate) -> dict:
+    return {
+        column: json.dumps(value) if value is not None else None
+        for column, value in (
+            ("weekly_intervals", user.intervals),
+            ("date_overrides", user.overrides),
+            ("date_exceptions", user.exceptions),
+        )
+    }
+
+
+def _avail_record(row) -> dict:
+    return {
+        "email": row.email,
+        "preferences": row.preferences,
+        "availabilities": _json_column(row.availabilities),
+        "created_at": row.created_at.isoformat() if isinstance(row.created_at, datetime) else row.created_at,
+        "version": row.version,
+        "intervals": _json_column(row.weekly_intervals),
+        "overrides": _json_column(row.date_overrides),
+        "exceptions": _json_column(row.date_exceptions),
+    }
+
+
+def user_etag(record: dict) -> str:
+    # version moves on every write; created_at tells a re-created user's version 1 from the old one's
+    stamp = zlib.crc32(f"{record.get('email')}|{record.get('created_at')}".encode())
+    return f'"{record.get("version")}-{stamp:08x}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    If-None-Match check with weak comparison: "*", or any listed tag with or without W/.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+async def load_user(email: str) -> Optional[dict]:
+    """
+    Read-through lookup shared by every read endpoint: cache first, then Postgres, refilling the cache.
+    """
+    data = await user_cache.get(email)
+    if data is not None:
+        return data
+    async with engine.connect() as conn:
+        row = (await conn.execute(
+            text(f"SELECT {USER_COLUMNS} FROM USERAVAIL WHERE email=:email"),
+            {"email": email},
+        )).first()
+    if row is None:
+        return None
+    data = _avail_record(row)
+    # a PUT/PATCH/DELETE that committed after this SELECT has already written or tombstoned the
+    # entry; the guarded fill leaves that in place instead of putting this row back
+    await user_cache.fill(data)
+    return data
+
+
+# bulk import/export: rows per upsert chunk, rejected rows listed in the response, rows per export fetch
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", 100))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+# CSV layout shared by import and export: one column per weekday with ";"-separated hours,
+# minute-level fields as JSON. Import also takes a single JSON "availabilities" column.
+CSV_JSON_COLUMNS = ("availabilities", "intervals", "overrides", "exceptions")
+EXPORT_CSV_COLUMNS = ["email", "preferences", "created_at", "version", *WEEKDAYS, "intervals", "overrides", "exceptions"]
+
+UPSERT_USER_SQL = text(
+    "INSERT INTO USERAVAIL (email, availabilities, preferences, created_at, "
+    "weekly_intervals, date_overrides, date_exceptions) "
+    "VALUES (:email, :availabilities, :preferences, :created_at, "
+    ":weekly_intervals, :date_overrides, :date_exceptions) "
+    "ON CONFLICT (email) DO UPDATE SET availabilities = EXCLUDED.availabilities, "
+    "preferences = EXCLUDED.preferences, weekly_intervals = EXCLUDED.weekly_intervals, "
+    "date_overrides = EXCLUDED.date_overrides, date_exceptions = EXCLUDED.date_exceptions, "
+    "version = USERAVAIL.version + 1"
+)
+
+
+async def iter_body_lines(request: Request):
+    # lines are yielded as they arrive, so the body never sits in memory as a whole
+    buf = b""
+    async for chunk in request.stream():
+        *lines, buf = (buf + chunk).split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if buf:
+        yield buf.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def _csv_user(header: List[str], values: List[str]) -> dict:
+    row = {}
+    for column, value in zip(header, values):
+        value = value.strip()
+        if column in WEEKDAYS:
+            row.setdefault("availabilities", {})[column] = [int(h) for h in value.replace(";", " ").split()]
+        elif value and column in CSV_JSON_COLUMNS:
+            row[column] = json.loads(value)
+        elif value:
+            row[column] = value
+    # all weekday cells empty: leave availabilities out so they are derived from intervals, as in POST /users
+    if not any(row.get("availabilities", {}).values()):
+        row.pop("availabilities", None)
+    return row
+
+
+async def iter_bulk_rows(request: Request, fmt: str):
+    """
+    yields: (line number, user dict) per record, or (line number, ValueError) for a line that can't be parsed
+    """
+    header = None
+    line_no = 0
+    async for line in iter_body_lines(request):
+        line_no += 1
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [column.strip().lower() for column in next(csv.reader([line]))]
+            if "email" not in header:
+                raise HTTPException(status_code=400, detail="CSV header must include an email column")
+            continue
+        try:
+            yield line_no, (_csv_user(header, next(csv.reader([line]))) if fmt == "csv" else json.loads(line))
+        except ValueError as e:
+            yield line_no, e
+
+
+async def upsert_users(users: List[UserCreate]) -> List[dict]:
+    """
+    One transaction per chunk: an executemany upsert (asyncpg pipelines the prepared statement)
+    and one SELECT reading back the stored rows with their versions.
+    """
+    created_ts = datetime.utcnow()
+    params = [
+        {
+            "email": user.email,
+            "availabilities": json.dumps(user.availabilities),
+            "preferences": user.preferences,
+            "created_at": created_ts,
+            **_interval_params(user),
+        }
+        for user in users
+    ]
+    async with engine.begin() as conn:
+        await conn.execute(UPSERT_USER_SQL, params)
+        rows = (await conn.execute(
+            text(f"SELECT {USER_COLUMNS} FROM USERAVAIL WHERE email = ANY(:emails)"),
+            {"emails": [user.email for user in users]},
+        )).fetchall()
+    return [_avail_record(row) for row in rows]
+
+
+@app.post("/users/bulk")
+async def bulk_import_users(request: Request):
+    """
+    Creates or replaces users from a streamed body: NDJSON (one POST /users object per line) or
+    CSV (see EXPORT_CSV_COLUMNS). Rows are upserted BULK_CHUNK_SIZE at a time and each chunk warms
+    the cache through one Redis pipeline. Rows that don't validate are skipped and reported; an
+    email repeated within a chunk keeps its last row and the earlier ones count as rejected.
+    Chunks already written stay written if a later chunk fails.
+    """
+    case_id = getattr(request.state, "case_id", "N/A")
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        fmt = "csv"
+    elif "ndjson" in content_type or "jsonl" in content_type:
+        fmt = "ndjson"
+    else:
+        raise HTTPException(status_code=415, detail="Send NDJSON (application/x-ndjson) or CSV (text/csv)")
+
+    start = time.perf_counter()
+    result = {"inserted": 0, "updated": 0, "rejected": 0, "chunks": 0}
+    errors = []
+    # email -> (line, user): one row per email, so each user is counted once per chunk
+    chunk: Dict[str, tuple] = {}
+
+    async def flush():
+        try:
+            records = await upsert_users([user for _, user in chunk.values()])
+        except Exception as e:
+            logger.error(f"[{case_id}] USER BULK upsert failed after {result['inserted'] + result['updated']} users err={e}")
+            raise HTTPException(
+                status_code=503,
+                detail=f"Database unavailable after importing {result['inserted'] + result['updated']} users",
+            )
+        # version 1 is a brand-new row; anything else replaced a user other services may hold
+        fresh = [record for record in records if record["version"] == 1]
+        replaced = [record for record in records if record["version"] != 1]
+        try:
+            await user_cache.set_many(fresh)
+            await user_cache.set_many(replaced, event="update")
+        except Exception as e:
+            logger.error(f"[{case_id}] USER BULK cache warm failed err={e}")
+        result["inserted"] += len(fresh)
+        result["updated"] += len(replaced)
+        result["chunks"] += 1
+        chunk.clear()
+
+    async for line_no, row in iter_bulk_rows(request, fmt):
+        try:
+            if isinstance(row, ValueError):
+                raise row
+            user = UserCreate.model_validate(row)
+            if user.email in chunk:
+                earlier = chunk.pop(user.email)[0]
+                result["rejected"] += 1
+                if len(errors) < BULK_MAX_ERRORS:
+                    errors.append({"line": earlier, "loc": ["email"], "msg": f"Replaced by line {line_no}"})
+            chunk[user.email] = (line_no, user)
+        except ValidationError as e:
+            result["rejected"] += 1
+            if len(errors) < BULK_MAX_ERRORS:
+                errors.extend({"line": line_no, "loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors())
+        except ValueError as e:
+            result["rejected"] += 1
+            if len(errors) < BULK_MAX_ERRORS:
+                errors.append({"line": line_no, "loc": [], "msg": str(e)})
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(
+        "[%s] USER BULK format=%s inserted=%d updated=%d rejected=%d ms=%.2f",
+        case_id, fmt, result["inserted"], result["updated"], result["rejected"], elapsed_ms,
+    )
+    return {"case_id": case_id, **result, "errors": errors[:BULK_MAX_ERRORS], "elapsed_ms": round(elapsed_ms, 2)}
+
+
+def _csv_export_row(record: dict) -> list:
+    availabilities = record.get("availabilities") or {}
+    return [
+        record["email"],
+        record.get("preferences") or "",
+        record.get("created_at") or "",
+        record.get("version"),
+        *(";".join(str(h) for h in availabilities.get(day, [])) for day in WEEKDAYS),
+        *(json.dumps(record[name]) if record.get(name) is not None else "" for name in ("intervals", "overrides", "exceptions")),
+    ]
+
+
+@app.get("/users/export")
+async def export_users(request: Request, fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format")):
+    """
+    Streams every user, ordered by email, as NDJSON (the GET /users/{email} shape) or as CSV that
+    POST /users/bulk reads back. Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time,
+    so memory use does not grow with the table. The connection is closed when the stream ends,
+    fails, or the client goes away mid-stream.
+    """
+    case_id = getattr(request.state, "case_id", "N/A")
+    conn = await engine.connect()
+    try:
+        result = await conn.stream(text(f"SELECT {USER_COLUMNS} FROM USERAVAIL ORDER BY email"))
+    except Exception as e:
+        await conn.close()
+        logger.error(f"[{case_id}] USER EXPORT failed err={e}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
+
+    async def body():
+        exported = 0
+        try:
+            if fmt == "csv":
+                out = io.StringIO()
+                writer = csv.writer(out, lineterminator="\n")
+                writer.writerow(EXPORT_CSV_COLUMNS)
+            async for rows in result.partitions(EXPORT_BATCH_SIZE):
+                records = [_avail_record(row) for row in rows]
+                if fmt == "csv":
+                    writer.writerows(_csv_export_row(record) for record in records)
+                    yield out.getvalue()
+                    out.seek(0)
+                    out.truncate()
+                else:
+                    yield "".join(json.dumps(record) + "\n" for record in records)
+                exported += len(records)
+        except Exception as e:
+            # headers are already sent: the client sees the stream end early
+            logger.error(f"[{case_id}] USER EXPORT failed after {exported} users err={e}")
+            raise
+        finally:
+            await conn.close()
+        logger.info("[%s] USER EXPORT format=%s users=%d", case_id, fmt, exported)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="users.{fmt}"'},
+        # runs after a disconnect too, when the generator is left suspended and its finally never runs
+        background=BackgroundTask(conn.close),
+    )
+
+
 @app.get("/users/{email_id}")
-async def get_user(email_id: str, request: Request):
-    # Implementation here
+async def get_user(email_id: str, request: Request, response: Response):
     case_id = getattr(request.state, "case_id", "N/A")
-    data = redis_client.hgetall(f"user:{email_id}")
-    if not data:
-        
-        with engine.connect() as conn:
-            txt=text(f"SELECT * FROM USERAVAIL WHERE email='{email_id}'")
-            res=conn.execute(txt)
-            rows=res.fetchall()
-            if len(rows)==0:
-                raise HTTPException(status_code=404, detail="User Not Found")
-            user_record=rows[0]
-            data={"email":user_record.email,"availabilities":json.loads(user_record.availabilities),"preferences":user_record.preferences,"created_at":user_record.created_at}
-            #populate redis cache
-            redis_client.hset(f"user:{email_id}",mapping=data)
-            logging.info(f"[{case_id}] USER GET: User with email: {email_id} fetched from database and cached in Redis")
-            return data
+    data = await load_user(email_id)
+    if data is None:
         logging.info(f"[{case_id}] USER GET: User with email: {email_id} not found in Redis cache or Database ")
         raise HTTPException(status_code=404, detail="User Not Found")
-    
-    logging.info(f"[{case_id}] USER GET: User with email: {email_id} fetched from Redis cache")
+
+    etag = user_etag(data)
+    if etag_matches(request, etag):
+        logging.info("[%s] USER GET: User with email: %s not modified", case_id, email_id)
+        return Response(status_code=304, headers={"ETag": etag})
+    logging.info("[%s] USER GET: User with email: %s fetched", case_id, email_id)
+    response.headers["ETag"] = etag
     return data
 
 
 @app.put("/users/{email_id}")
 async def update_user(email_id: str, user: UserCreate, request: Request):
-    # Implementation here
+    """
+    One transaction (UPDATE ... RETURNING the stored row, so a missing user is a 404 without a
+    prior read) and one Redis script that rewrites the cache entry, unless a newer version got
+    there first, and publishes the update.
+    """
     case_id = getattr(request.state, "case_id", "N/A")
-    existing_user = await get_user(email_id, request)
 
-    if not existing_user:
+    async with engine.begin() as conn:
+        row = (await conn.execute(
+            text(
+                "UPDATE USERAVAIL "
+                "SET availabilities = :availabilities, preferences = :preferences, "
+                "weekly_intervals = :weekly_intervals, date_overrides = :date_overrides, "
+                "date_exceptions = :date_exceptions, version = version + 1 "
+                f"WHERE email = :email RETURNING {USER_COLUMNS}"
+            ),
+            {
+                "email": email_id,
+                "availabilities": json.dumps(user.availabilities),
+                "preferences": user.preferences,
+                **_interval_params(user),
+            },
+        )).first()
+
+    if row is None:
         logging.info(f"[{case_id}] USER UPDATE: User with email: {email_id} not found for update")
         raise HTTPException(status_code=404, detail="User Not Found")
-    updated_user = {
-        "email": user.email,
-        "availabilities": user.availabilities,
-        "preferences": user.preferences,
-        "created_at": existing_user["created_at"]
-    }
-    redis_client.hset(f"user:{email_id}", mapping=updated_user)
-    logging.info(f"[{case_id}] USER UPDATE: User with email: {email_id} updated in Redis")
-
-    with engine.connect() as conn:
-        txt = text(
-            "UPDATE USERAVAIL "
-            "SET availabilities = :availabilities, preferences = :preferences "
-            "WHERE email = :email"
+
+    updated_user = _avail_record(row)
+    await user_cache.set(updated_user, event="update")
+    logging.info("[%s] USER UPDATE: User with email: %s updated to version %s", case_id, email_id, updated_user["version"])
+
+    return updated_user
+
+def _week_bits(hours_by_day: Dict[str, List[int]]) -> str:
+    # 168-character bit string for CAST(... AS bit(168)): character i is slot i = day_index * 24 + hour
+    bits = ["0"] * (len(WEEKDAYS) * 24)
+    for day, hours in hours_by_day.items():
+        for hour in hours:
+            bits[WEEKDAYS.index(day) * 24 + hour] = "1"
+    return "".join(bits)
+
+
+def _patch_availabilities_sql(day_count: int):
+    """
+    One jsonb_set per touched day: that day's array becomes (old hours UNION added) minus removed.
+    Untouched days are carried over as they are. Stored entries that aren't whole hours (rows
+    from before hours were validated) are dropped, as useravail_free_slots skips them.
+    """
+    expr = "availabilities"
+    for i in range(day_count):
+        expr = (
+            f"jsonb_set({expr}, ARRAY[CAST(:day_{i} AS text)], ("
+            "SELECT COALESCE(jsonb_agg(h ORDER BY h), CAST('[]' AS jsonb)) FROM ("
+            "SELECT CAST(hour AS int) AS h FROM ("
+            "SELECT CASE WHEN jsonb_typeof(value) = 'number' THEN CAST(value AS numeric) END AS hour "
+            f"FROM jsonb_array_elements(CASE WHEN jsonb_typeof(availabilities -> CAST(:day_{i} AS text)) = 'array' "
+            f"THEN availabilities -> CAST(:day_{i} AS text) ELSE CAST('[]' AS jsonb) END)"
+            ") AS stored WHERE hour BETWEEN 0 AND 23 AND hour = trunc(hour) "
+            f"UNION SELECT unnest(CAST(:add_{i} AS int[]))"
+            f") AS hours WHERE h <> ALL(CAST(:remove_{i} AS int[]))"
+            "), true)"
         )
-        conn.execute(txt, {
-            "email": email_id,
-            "availabilities": json.dumps(user.availabilities),
-            "preferences": user.preferences,
-        })
+    # users with minute-level intervals get the same hours added to / cut out of those days'
+    # intervals (int4multirange union and difference), so interval-aware readers see the change too
+    intervals = "weekly_intervals"
+    for i in range(day_count):
+        intervals = (
+            f"jsonb_set({intervals}, ARRAY[CAST(:day_{i} AS text)], ("
+            "SELECT COALESCE(jsonb_agg(jsonb_build_array(lower(r), upper(r)) ORDER BY lower(r)), CAST('[]' AS jsonb)) "
+            "FROM unnest((SELECT COALESCE(range_agg(int4range(CAST(value ->> 0 AS int), CAST(value ->> 1 AS int))), "
+            "CAST('{}' AS int4multirange)) FROM jsonb_array_elements("
+            f"COALESCE(weekly_intervals -> CAST(:day_{i} AS text), CAST('[]' AS jsonb)))) "
+            f"+ {_hour_ranges_sql(f'add_{i}')} - {_hour_ranges_sql(f'remove_{i}')}) AS r"
+            "), true)"
+        )
+    return text(
+        f"UPDATE USERAVAIL SET availabilities = {expr}, "
+        # NULL or {} means hours only; leave those alone rather than start a one-day template
+        f"weekly_intervals = CASE WHEN weekly_intervals = CAST('{{}}' AS jsonb) THEN weekly_intervals "
+        f"ELSE {intervals} END, "
+        # masks travel as '0'/'1' text: asyncpg would want a BitString for a bit parameter
+        "avail_mask = (COALESCE(avail_mask, CAST(repeat('0', 168) AS bit(168))) "
+        "| CAST(CAST(:add_mask AS text) AS bit(168))) & ~CAST(CAST(:remove_mask AS text) AS bit(168)), "
+        "version = version + 1 "
+        "WHERE email = :email "
+        "RETURNING version, (SELECT jsonb_object_agg(key, value) FROM jsonb_each(availabilities) "
+        "WHERE key = ANY(CAST(:days AS text[]))) AS days, weekly_intervals"
+    )
+
+
+def _hour_ranges_sql(param: str) -> str:
+    # whole hours as one multirange of minutes: hour h is [h * 60, h * 60 + 60)
+    return (
+        f"(SELECT COALESCE(range_agg(int4range(h * 60, h * 60 + 60)), CAST('{{}}' AS int4multirange)) "
+        f"FROM unnest(CAST(:{param} AS int[])) AS h)"
+    )
+
 
-        logging.info(f"[{case_id}] USER UPDATE: User with email: {email_id} updated")
-    logging.info(f"[{case_id}] USER UPDATE: User with email: {email_id} updated in Database")
+@app.patch("/users/{email_id}/availabilities")
+async def patch_user_availabilities(email_id: str, delta: AvailabilityPatch, request: Request):
+    """
+    Adds and removes hours on the days named in the body. One UPDATE rewrites only those days'
+    arrays (jsonb_set) and updates avail_mask with bit operations, which the trigger then trusts.
+    Users with minute-level intervals get the same hours added to and cut out of those days'
+    intervals in the same UPDATE. One Redis call writes the same days into the cached entry.
+    returns: the new version and the changed days' hours (and intervals, for users that have them)
+    """
+    case_id = getattr(request.state, "case_id", "N/A")
+    days = sorted(set(delta.add) | set(delta.remove), key=WEEKDAYS.index)
+    params = {
+        "email": email_id,
+        "days": days,
+        "add_mask": _week_bits(delta.add),
+        "remove_mask": _week_bits(delta.remove),
+    }
+    for i, day in enumerate(days):
+        params[f"day_{i}"] = day
+        params[f"add_{i}"] = delta.add.get(day, [])
+        params[f"remove_{i}"] = delta.remove.get(day, [])
 
-    return await get_user(email_id,request)
+    async with engine.begin() as conn:
+        row = (await conn.execute(_patch_availabilities_sql(len(days)), params)).first()
+
+    if row is None:
+        logging.info(f"[{case_id}] USER PATCH: User with email: {email_id} not found")
+        raise HTTPException(status_code=404, detail="User Not Found")
+
+    changed = _json_column(row.days) or {}
+    intervals = _json_column(row.weekly_intervals)
+    patched = await user_cache.patch_days(email_id, row.version, changed, intervals=intervals)
+    logging.info(
+        "[%s] USER PATCH: User with email: %s days=%s version=%s cache=%s",
+        case_id, email_id, ",".join(days), row.version, "patched" if patched else "dropped",
+    )
+    response = {"email": email_id, "version": row.version, "availabilities": changed}
+    if intervals:
+        response["intervals"] = {day: intervals.get(day, []) for day in days}
+    return response
 
 @app.delete("/users/{email_id}", status_code=204)
 async def delete_user(email_id: str, request: Request):
-    # Implementation here
+    """
+    One transaction (DELETE ... RETURNING) and one Redis MULTI that drops the entry and publishes the delete.
+    """
     case_id = getattr(request.state, "case_id", "N/A")
-    existing_user = await get_user(email_id, request)
-    if not existing_user:
+
+    async with engine.begin() as conn:
+        deleted = (await conn.execute(
+            text("DELETE FROM USERAVAIL WHERE email = :email RETURNING email"),
+            {"email": email_id},
+        )).first()
+
+    if deleted is None:
         logging.info(f"[{case_id}] USER DELETE: User with email: {email_id} not found for deletion")
         raise HTTPException(status_code=404, detail="User Not Found")
-    redis_client.delete(f"user:{email_id}")
-    logging.info(f"[{case_id}] USER DELETE: User with email:{email_id} deleted from Redis")
 
-    with engine.connect() as conn:
-        txt=text(f"DELETE FROM USERAVAIL where email='{email_id}'")
-        conn.execute(txt)
-        logging.info(f"[{case_id}] USER DELETE: User with email:{email_id} deleted from Database")
+    await user_cache.invalidate(email_id)
+    logging.info("[%s] USER DELETE: User with email: %s deleted", case_id, email_id)
     return Response(status_code=204)
 
+
 @app.get("/user-avail/cache-aside")
-async def get_user_avail_cache_aside(request: Request, user1email:str= Query()):
+async def get_user_avail_cache_aside(request: Request, response: Response, user1email:str= Query()):
+    case_id = getattr(request.state, "case_id", "N/A")
+
+    try:
+        data = await load_user(user1email)
+    except Exception as e:
+        logger.error(f"[{case_id}] CACHE_ASIDE ERROR email={user1email} err={e}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
+
+    if data is None:
+        logger.info(f"[{case_id}] CACHE_ASIDE 404 email={user1email}")
+        raise HTTPException(status_code=404, detail=f"User {user1email} not found in database")
+    etag = user_etag(data)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return data
+
+
+@app.post("/user-avail/batch")
+async def get_user_avail_batch(body: UserAvailBatch, request: Request):
+    """
+    Cache-aside lookup for many users at once: one pipelined cache read, one SELECT for the
+    misses and one pipelined backfill, regardless of how many emails are asked for. Users whose
+    ETag matches known_etags are listed in not_modified and sent without a body.
+    """
+    case_id = getattr(request.state, "case_id", "N/A")
+    emails = list(dict.fromkeys(body.emails))
+
+    try:
+        found = await user_cache.get_many(emails)
+        misses = [email for email in emails if email not in found]
+        logging.info("[%s] CACHE ASIDE BATCH: requested=%d hits=%d misses=%d", case_id, len(emails), len(found), len(misses))
+
+        if misses:
+            async with engine.connect() as conn:
+                rows = (await conn.execute(
+                    text(f"SELECT {USER_COLUMNS} FROM USERAVAIL WHERE email = ANY(:emails)"),
+                    {"emails": misses},
+                )).fetchall()
+
+            loaded = [_avail_record(row) for row in rows]
+            await user_cache.fill_many(loaded)
+            found.update((data["email"], data) for data in loaded)
+    except Exception as e:
+        logger.error(f"[{case_id}] CACHE_ASIDE BATCH ERROR err={e}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
+
+    etags = {email: user_etag(found[email]) for email in emails if email in found}
+    not_modified = [email for email, etag in etags.items() if body.known_etags.get(email) == etag]
+    if not_modified:
+        logging.info("[%s] CACHE ASIDE BATCH: not_modified=%d", case_id, len(not_modified))
+    unchanged = set(not_modified)
+    return {
+        "users": {email: found[email] for email in etags if email not in unchanged},
+        "etags": {email: etag for email, etag in etags.items() if email not in unchanged},
+        "not_modified": not_modified,
+        "missing": [email for email in emails if email not in found],
+    }
+
+
+@app.get("/user-avail/free-at")
+async def get_users_free_at(
+    request: Request,
+    day: Weekday = Query(),
+    hour: int = Query(ge=0, le=23),
+    limit: int = Query(100, ge=1),
+):
+    """
+    Users free for the hour starting at `hour` on `day`, answered from the GIN index on free_slots.
+    """
     case_id = getattr(request.state, "case_id", "N/A")
-    logging.info("CACHE ASIDE: request received for symbols %s", user1email)
-    #  check redis for the kv pair
+    slot = WEEKDAYS.index(day) * 24 + hour
+    limit = min(limit, MAX_SEARCH_RESULTS)
 
     try:
-        cached_data = redis_client.get(f"cache_aside_{user1email.upper()}")
-        if cached_data:
-            logging.info(f"[{case_id}] CACHE ASIDE: CACHE HIT with key cache_aside_{user1email.upper()} served from Redis {cached_data}")
-            return json.loads(cached_data)
-        else:
-            logging.info(f"[{case_id}] CACHE ASIDE: CACHE MISS with key cache_aside_{user1email.upper()} fetching from provider")
-            #default base is USD
-            try:
-                with engine.connect() as conn:
-                    txt=text(f"SELECT * FROM USERAVAIL WHERE email='{user1email}'")
-                    res=conn.execute(txt)
-                    rows=res.fetchall()
-                    if not rows:
-                        logger.info(f"[{case_id}] CACHE_ASIDE 404 email={user1email}")
-                        raise HTTPException(status_code=404, detail=f"User {user1email} not found in database")
-                    rows=rows[0]
-                    data = {
-                    "email": rows.email,
-                    "preferences": rows.preferences,
-                    "availabilities": json.loads(rows.availabilities)if isinstance(rows.availabilities, str) else rows.availabilities,  # IMPORTANT
-                    "created_at": rows.created_at.isoformat() if rows.created_at else None,
-                    }
-                    logging.info(f"[{case_id}] CACHE ASIDE: successfully fetched fresh data from database for cache_aside_{user1email.upper()}")
-                    ttl_seconds = int(os.getenv("TTL_SECONDS", 3300))
-                    redis_client.setex(f"cache_aside_{user1email.upper()}", ttl_seconds, json.dumps(data))
-                    logging.info(f"[{case_id}] CACHE ASIDE: WRITE CACHE with cache_aside_{user1email.upper()} stored with TTL={ttl_seconds}s")
-                    return data
-            except HTTPException:
-                raise
+        async with engine.connect() as conn:
+            rows = (await conn.execute(
+                text(
+                    "SELECT email FROM USERAVAIL WHERE free_slots @> ARRAY[CAST(:slot AS smallint)] "
+                    "ORDER BY email LIMIT :limit"
+                ),
+                {"slot": slot, "limit": limit},
+            )).fetchall()
+    except Exception as e:
+        logger.error(f"[{case_id}] FREE_AT ERROR day={day} hour={hour} err={e}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
+
+    logging.info(f"[{case_id}] FREE_AT day={day} hour={hour} matches={len(rows)}")
+    return {"day": day, "hour": hour, "slot": slot, "users": [row.email for row in rows]}
+
+
+@app.get("/user-avail/overlaps")
+async def get_user_overlaps(
+    request: Request,
+    email: str = Query(),
+    min_hours: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1),
+):
+    """
+    Users sharing at least `min_hours` free hours with `email`, most shared hours first.
+    Candidates come from the GIN index (free_slots &&); the shared-hour count is bit_count of the ANDed masks.
+    """
+    case_id = getattr(request.state, "case_id", "N/A")
+    limit = min(limit, MAX_SEARCH_RESULTS)
+
+    try:
+        async with engine.connect() as conn:
+            user = (await conn.execute(
+                text("SELECT free_slots FROM USERAVAIL WHERE email = :email"),
+                {"email": email},
+            )).first()
+            if user is None:
+                raise HTTPException(status_code=404, detail="User Not Found")
+
+            rows = (await conn.execute(
+                text(
+                    "SELECT o.email, bit_count(o.avail_mask & u.avail_mask) AS shared_hours "
+                    "FROM USERAVAIL u JOIN USERAVAIL o ON o.free_slots && u.free_slots AND o.email <> u.email "
+                    "WHERE u.email = :email AND bit_count(o.avail_mask & u.avail_mask) >= :min_hours "
+                    "ORDER BY shared_hours DESC, o.email LIMIT :limit"
+                ),
+                {"email": email, "min_hours": min_hours, "limit": limit},
+            )).fetchall()
     except HTTPException:
         raise
-                #no loggin metnioned?
     except Exception as e:
-        logger.error(f"[{case_id}] CACHE_ASIDE ERROR email={user1email} err={e}")
+        logger.error(f"[{case_id}] OVERLAPS ERROR email={email} err={e}")
         raise HTTPException(status_code=503, detail="Database unavailable")
+
+    logging.info(f"[{case_id}] OVERLAPS email={email} matches={len(rows)}")
+    return {
+        "email": email,
+        "free_hours": len(user.free_slots or []),
+        "overlaps": [{"email": row.email, "shared_hours": row.shared_hours} for row in rows],
+    }
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return user_cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
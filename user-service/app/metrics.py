@@ -0,0 +1,140 @@
+import time
+from typing import Callable, Dict, Iterable
+
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app import tracing
+
+# Prometheus metrics, served at GET /metrics. The same module is copied into every service;
+# Prometheus adds the service name through its scrape job, so no series carries it.
+#
+# Hot-path cost is one histogram observation per request, downstream call and Redis/Postgres
+# round trip. Counters the services already keep (cache hits/misses, consumer and pool stats)
+# are read at scrape time through StatsCollector instead of being incremented twice.
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+)
+DOWNSTREAM_LATENCY = Histogram(
+    "downstream_request_duration_seconds",
+    "Latency of calls to other services; status is the HTTP code or 'error'",
+    ["target", "method", "status"],
+)
+DEPENDENCY_LATENCY = Histogram(
+    "dependency_call_duration_seconds",
+    "Redis and Postgres round trips",
+    ["dependency", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+QUEUE_MESSAGES = Counter(
+    "queue_messages",
+    "RabbitMQ messages by outcome (published, publish_failed)",
+    ["queue", "outcome"],
+)
+QUEUE_DEPTH = Gauge("queue_depth", "Ready messages at the last depth check", ["queue"])
+
+
+def route_label(request: Request) -> str:
+    # the route template, not the raw path, so /users/{email_id} stays a single series
+    return getattr(request.scope.get("route"), "path", "unmatched")
+
+
+def observe_request(request: Request, status_code: int, seconds: float):
+    REQUEST_LATENCY.labels(request.method, route_label(request), str(status_code)).observe(seconds)
+
+
+def observe_downstream(target: str, method: str, status: str, seconds: float):
+    DOWNSTREAM_LATENCY.labels(target, method, status).observe(seconds)
+
+
+class timed:
+    """
+    Times a Redis/Postgres round trip: `with timed("redis", "get_many"): await pipe.execute()`.
+    The timing also becomes a span under the current request's trace.
+    """
+
+    __slots__ = ("child", "name", "start")
+
+    def __init__(self, dependency: str, operation: str):
+        self.child = DEPENDENCY_LATENCY.labels(dependency, operation)
+        self.name = f"{dependency} {operation}"
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.child.observe(elapsed)
+        tracing.record(self.name, elapsed)
+        return False
+
+
+def instrument_engine(engine):
+    """
+    Times every statement on a SQLAlchemy (async) engine, labelled by its leading SQL verb.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("query_start", None)
+        if start is not None:
+            verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+            elapsed = time.perf_counter() - start
+            DEPENDENCY_LATENCY.labels("postgres", verb).observe(elapsed)
+            tracing.record(f"postgres {verb}", elapsed)
+
+
+class StatsCollector:
+    """
+    Exposes existing stats() dicts at scrape time: caches as cache_requests_total{cache, result},
+    other components as component_events_total (monotonic fields) and component_state (the rest).
+    """
+
+    def __init__(self):
+        self.caches: Dict[str, Callable[[], dict]] = {}
+        self.components: Dict[str, tuple] = {}
+
+    def add_cache(self, name: str, stats: Callable[[], dict]):
+        self.caches[name] = stats
+
+    def add_component(self, name: str, stats: Callable[[], dict], counters: Iterable[str] = ()):
+        self.components[name] = (stats, frozenset(counters))
+
+    def collect(self):
+        requests = CounterMetricFamily("cache_requests", "Cache lookups by result", labels=["cache", "result"])
+        for name, stats in self.caches.items():
+            values = stats()
+            requests.add_metric([name, "hit"], values.get("hits", 0))
+            requests.add_metric([name, "miss"], values.get("misses", 0))
+        events = CounterMetricFamily("component_events", "Monotonic component counters", labels=["component", "event"])
+        state = GaugeMetricFamily("component_state", "Point-in-time component values", labels=["component", "field"])
+        for name, (stats, counters) in self.components.items():
+            for field, value in stats().items():
+                if not isinstance(value, (int, float)):
+                    continue
+                if field in counters:
+                    events.add_metric([name, field], value)
+                else:
+                    state.add_metric([name, field], value)
+        yield requests
+        yield events
+        yield state
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def metrics_response() -> Response:
+    # set as a header so Starlette does not append a second charset to the exposition type
+    return Response(generate_latest(REGISTRY), headers={"Content-Type": CONTENT_TYPE_LATEST})
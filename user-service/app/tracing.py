@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Span tracing keyed on the Case-ID: the Case-ID is the trace id, and every span records the
+# span that caused it. The caller's span id travels in PARENT_HEADER over HTTP and in the job
+# payload over RabbitMQ. The same module is copied into every service. Each service appends
+# its finished spans to `<TRACE_DIR>/<service>.jsonl`, and tools/trace_report.py joins those files.
+CASE_HEADER = "Case-ID"
+PARENT_HEADER = "Parent-Span-ID"
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", 1))
+# spans kept in memory while the file can't be written; the oldest are dropped beyond this
+TRACE_BUFFER_MAX = int(os.getenv("TRACE_BUFFER_MAX", 50000))
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attrs")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attrs: dict):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    def set(self, key: str, value):
+        self.attrs[key] = value
+
+    def rename(self, name: str):
+        self.name = name
+
+
+class _NoopSpan:
+    # stands in when tracing is off or there is no trace to join, so callers never check for None
+    span_id = None
+
+    def set(self, key: str, value):
+        pass
+
+    def rename(self, name: str):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def propagation_headers() -> dict:
+    """
+    Headers that make the next hop's spans children of the current one.
+    """
+    span = _current.get()
+    if span is None:
+        return {}
+    return {CASE_HEADER: span.trace_id, PARENT_HEADER: span.span_id}
+
+
+class Tracer:
+    """
+    One per service process, created in main.py. The last one created also serves the
+    module-level span()/record() helpers used by shared code (http_pool, metrics).
+    """
+
+    def __init__(self, service: str, directory: str = TRACE_DIR, enabled: bool = TRACE_ENABLED):
+        global _active
+        self.service = service
+        self.enabled = enabled
+        self.path = os.path.join(directory, f"{service}.jsonl")
+        self._buffer = []
+        self.exported = 0
+        self.dropped = 0
+        _active = self
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attrs):
+        """
+        Opens a span around the block. With `trace_id` it starts (or continues, via `parent_id`)
+        that trace; without one it becomes a child of the current span, or a no-op if none is open.
+        """
+        parent = _current.get()
+        if not self.enabled or (trace_id is None and parent is None):
+            yield NOOP_SPAN
+            return
+        if trace_id is None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        span = Span(trace_id, parent_id, name, attrs)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set("error", type(e).__name__)
+            raise
+        finally:
+            _current.reset(token)
+            span.end = time.time()
+            self._export(span)
+
+    def record(
+        self,
+        name: str,
+        seconds: float,
+        end: Optional[float] = None,
+        trace_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        **attrs,
+    ):
+        """
+        Adds an already-finished span for a timing taken elsewhere (a Redis/Postgres round trip,
+        the time a job sat in the queue): a child of the current span unless `trace_id` is given.
+        end: epoch seconds, defaults to now
+        """
+        if not self.enabled:
+            return
+        if trace_id is None:
+            parent = _current.get()
+            if parent is None:
+                return
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        span = Span(trace_id, parent_id, name, attrs)
+        span.end = end if end is not None else time.time()
+        span.start = span.end - seconds
+        self._export(span)
+
+    def _export(self, span: Span):
+        if len(self._buffer) >= TRACE_BUFFER_MAX:
+            self._buffer.pop(0)
+            self.dropped += 1
+        self._buffer.append({
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "service": self.service,
+            "name": span.name,
+            "start": round(span.start, 6),
+            "duration_ms": round((span.end - span.start) * 1000, 3),
+            **({"attrs": span.attrs} if span.attrs else {}),
+        })
+
+    def _write(self, batch: list):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(s, separators=(",", ":")) + "\n" for s in batch))
+
+    async def flush(self):
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        try:
+            # file I/O off the event loop so request handling never waits on the disk
+            await asyncio.to_thread(self._write, batch)
+            self.exported += len(batch)
+        except Exception as e:
+            logger.error(f"TRACE: could not write {len(batch)} spans to {self.path} err={e}")
+            self._buffer[:0] = batch[-TRACE_BUFFER_MAX:]
+
+    async def run(self):
+        """
+        Background exporter started in the lifespan; flushes one final time when cancelled.
+        """
+        try:
+            while True:
+                await asyncio.sleep(TRACE_FLUSH_SECONDS)
+                await self.flush()
+        finally:
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "buffered": len(self._buffer),
+            "exported": self.exported,
+            "dropped": self.dropped,
+        }
+
+
+_active: Optional[Tracer] = None
+
+
+@contextmanager
+def _noop():
+    yield NOOP_SPAN
+
+
+def span(name: str, **kwargs):
+    return _active.span(name, **kwargs) if _active is not None else _noop()
+
+
+def record(name: str, seconds: float, **kwargs):
+    if _active is not None:
+        _active.record(name, seconds, **kwargs)
@@ -0,0 +1,128 @@
+"""
+A read-through backfill must not put back a row that a PUT, PATCH or DELETE replaced while the
+read was still in flight. Runs against fakeredis (with lupa for the Lua scripts), no services:
+
+    cd user-service && python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+os.environ.setdefault("PG_DSN", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("LOG_CONSOLE", "false")
+os.environ.setdefault("TRACE_ENABLED", "false")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.cache import UserCache, cache_key  # noqa: E402
+
+
+def record(email, version, created_at="2024-01-01T00:00:00", monday=(9,)):
+    return {
+        "email": email,
+        "preferences": "first",
+        "availabilities": {"monday": list(monday)},
+        "created_at": created_at,
+        "version": version,
+    }
+
+
+def run(coro_fn):
+    async def scenario():
+        cache = UserCache(fakeredis.FakeAsyncRedis(decode_responses=True), ttl_seconds=60)
+        return await coro_fn(cache)
+    return asyncio.run(scenario())
+
+
+def test_fill_writes_missing_and_older_entries():
+    async def scenario(cache):
+        assert await cache.fill(record("a@x.com", 1))
+        assert await cache.fill(record("a@x.com", 2))
+        assert (await cache.get("a@x.com"))["version"] == 2
+        assert await cache.redis.ttl(cache_key("a@x.com")) > 0
+    run(scenario)
+
+
+def test_fill_never_replaces_a_newer_write():
+    async def scenario(cache):
+        await cache.set(record("a@x.com", 3, monday=(10,)), event="update")
+        assert not await cache.fill(record("a@x.com", 2))
+        assert not await cache.fill(record("a@x.com", 3))
+        assert (await cache.get("a@x.com"))["availabilities"]["monday"] == [10]
+
+        # the user was deleted and re-created once the tombstone had expired: version 1 of the new
+        # user beats version 5 of the old
+        await cache.redis.delete(cache_key("a@x.com"))
+        await cache.set(record("a@x.com", 1, created_at="2024-06-01T00:00:00"))
+        assert not await cache.fill(record("a@x.com", 5))
+        assert cache.stats()["fills_skipped"] == 3
+    run(scenario)
+
+
+def test_fill_after_delete_is_dropped():
+    async def scenario(cache):
+        await cache.set(record("a@x.com", 1))
+        await cache.invalidate("a@x.com")
+        assert not await cache.fill(record("a@x.com", 1))
+        assert await cache.get("a@x.com") is None
+
+        # a write-through can't tell a re-created user from a late write either; both wait it out
+        assert not await cache.set(record("a@x.com", 1, created_at="2024-06-01T00:00:00"))
+        assert await cache.get("a@x.com") is None
+    run(scenario)
+
+
+def test_fill_after_dropped_patch_waits_for_its_version():
+    async def scenario(cache):
+        # nothing cached, so the patch for version 4 leaves a tombstone instead of applying
+        assert not await cache.patch_days("a@x.com", 4, {"monday": [9, 10]})
+        assert await cache.get("a@x.com") is None
+        await cache.fill_many([record("a@x.com", 3), record("b@x.com", 1)])
+        assert await cache.get("a@x.com") is None
+        assert (await cache.get("b@x.com"))["version"] == 1
+        assert await cache.fill(record("a@x.com", 4, monday=(9, 10)))
+        assert (await cache.get("a@x.com"))["availabilities"]["monday"] == [9, 10]
+    run(scenario)
+
+
+def test_delete_during_read_through_load():
+    os.chdir(os.environ.get("TMPDIR", "/tmp"))
+    import app.main as main
+
+    email = "race@example.com"
+    selected = asyncio.Event()
+    release = asyncio.Event()
+
+    class SlowConnection:
+        async def execute(self, stmt, params=None):
+            # the SELECT saw the row; the DELETE commits before load_user gets to the cache
+            selected.set()
+            await release.wait()
+            return SimpleNamespace(first=lambda: SimpleNamespace(
+                email=email, preferences="first", availabilities='{"monday": [9]}', created_at=None,
+                version=1, weekly_intervals=None, date_overrides=None, date_exceptions=None,
+            ))
+
+    @asynccontextmanager
+    async def connect():
+        yield SlowConnection()
+
+    async def scenario():
+        main.user_cache = UserCache(fakeredis.FakeAsyncRedis(decode_responses=True), ttl_seconds=60)
+        main.engine = SimpleNamespace(connect=connect)
+        load = asyncio.create_task(main.load_user(email))
+        await selected.wait()
+        await main.user_cache.invalidate(email)  # what DELETE /users/{email} does after its commit
+        release.set()
+        return await load, await main.user_cache.get(email)
+
+    loaded, cached = asyncio.run(scenario())
+    # the read that started before the delete still answers, but doesn't resurrect the entry
+    assert loaded["version"] == 1
+    assert cached is None
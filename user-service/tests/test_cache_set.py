@@ -0,0 +1,71 @@
+"""
+Write-throughs (create, PUT, bulk import) whose Redis calls land out of commit order must leave
+the newer version cached. Runs against fakeredis (with lupa for the Lua scripts), no services:
+
+    cd user-service && python -m pytest -q tests
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+os.environ.setdefault("LOG_CONSOLE", "false")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.cache import INVALIDATION_CHANNEL, UserCache  # noqa: E402
+
+
+def record(email, version, monday=(9,)):
+    return {
+        "email": email,
+        "preferences": "first",
+        "availabilities": {"monday": list(monday)},
+        "created_at": "2024-01-01T00:00:00",
+        "version": version,
+    }
+
+
+def run(coro_fn):
+    async def scenario():
+        cache = UserCache(fakeredis.FakeAsyncRedis(decode_responses=True), ttl_seconds=60)
+        return await coro_fn(cache)
+    return asyncio.run(scenario())
+
+
+def test_put_landing_after_a_newer_put_is_dropped():
+    async def scenario(cache):
+        pubsub = cache.redis.pubsub()
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        await pubsub.get_message(timeout=0.1)
+
+        # two PUTs committed v2 then v3; their cache writes arrive v3 first
+        assert await cache.set(record("a@x.com", 3, monday=(11,)), event="update")
+        assert not await cache.set(record("a@x.com", 2, monday=(10,)), event="update")
+        cached = await cache.get("a@x.com")
+        assert cached["version"] == 3 and cached["availabilities"]["monday"] == [11]
+        assert cache.stats()["writes_skipped"] == 1
+
+        # subscribers hear about both writes even though only one was cached
+        events = []
+        while (message := await pubsub.get_message(timeout=0.1)) is not None:
+            events.append(json.loads(message["data"])["version"])
+        assert events == [3, 2]
+    run(scenario)
+
+
+def test_set_many_keeps_newer_entries_and_tombstones():
+    async def scenario(cache):
+        await cache.set(record("a@x.com", 5))
+        await cache.set(record("b@x.com", 1))
+        await cache.invalidate("c@x.com")
+        await cache.set_many([record("a@x.com", 4), record("b@x.com", 2), record("c@x.com", 7)], event="update")
+        assert (await cache.get("a@x.com"))["version"] == 5
+        assert (await cache.get("b@x.com"))["version"] == 2
+        assert await cache.get("c@x.com") is None
+        assert cache.stats()["writes_skipped"] == 2
+    run(scenario)
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger("worker-service")
+
+
+class JobConsumer:
+    """
+    Runs queued jobs with up to `concurrency` in flight behind a semaphore.
+
+    With batch_size > 1, deliveries are grouped for up to `batch_window` seconds (or until the
+    batch is full) and resolved through one `run_batch` call. Deliveries block while every slot
+    is busy, which together with the channel prefetch gives backpressure to the broker.
+
+    Messages only need `body`, `process(requeue=...)`, `ack()` and `reject(requeue=...)`, so the
+    same consumer runs on aio_pika or on an in-memory broker in benchmarks.
+    """
+
+    def __init__(
+        self,
+        run_job: Callable[[dict], Awaitable],
+        run_batch: Optional[Callable[[List[dict]], Awaitable[list]]] = None,
+        concurrency: int = 8,
+        batch_size: int = 1,
+        batch_window: float = 0.02,
+    ):
+        self.run_job = run_job
+        self.run_batch = run_batch
+        self.concurrency = max(concurrency, 1)
+        self.batch_size = batch_size if run_batch is not None else 1
+        self.batch_window = batch_window
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._tasks = set()
+        self._pending = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._draining = False
+
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+
+    async def on_message(self, message):
+        if self._draining:
+            # shutting down: hand the delivery back so another consumer picks it up
+            await message.reject(requeue=True)
+            return
+        payload = json.loads(message.body.decode("utf-8"))
+
+        if self.batch_size > 1:
+            self._pending.append((message, payload))
+            if len(self._pending) >= self.batch_size:
+                await self._flush()
+            elif self._flush_timer is None:
+                loop = asyncio.get_running_loop()
+                self._flush_timer = loop.call_later(self.batch_window, self._flush_soon)
+            return
+
+        await self._slots.acquire()
+        self._spawn(self._run_one(message, payload))
+
+    def _spawn(self, coro):
+        self.in_flight += 1
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self.in_flight -= 1
+        self._slots.release()
+
+    def _flush_soon(self):
+        self._flush_timer = None
+        if self._pending:
+            task = asyncio.create_task(self._flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        await self._slots.acquire()
+        self._spawn(self._run_batch(batch))
+
+    async def _run_one(self, message, payload: dict):
+        try:
+            async with message.process(requeue=False):
+                await self.run_job(payload)
+            self.processed += 1
+        except Exception:
+            # process() has already rejected the message; run_job logs the cause
+            self.failed += 1
+
+    async def _run_batch(self, batch: list):
+        self.batches += 1
+        try:
+            results = await self.run_batch([payload for _, payload in batch])
+        except Exception as e:
+            logger.error(f"BATCH_ERROR size={len(batch)} err={e}")
+            results = [e] * len(batch)
+        for (message, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                self.failed += 1
+                await message.reject(requeue=False)
+            else:
+                self.processed += 1
+                await message.ack()
+
+    async def drain(self, timeout: float):
+        """
+        Stops taking work, flushes a partial batch and waits up to `timeout` for in-flight jobs.
+        """
+        self._draining = True
+        await self._flush()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # a pending flush can still spawn a batch task, so wait until the set stays empty
+        while self._tasks:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                logger.error(f"DRAIN timed out with {len(self._tasks)} jobs still running")
+                for task in list(self._tasks):
+                    task.cancel()
+                break
+            await asyncio.wait(set(self._tasks), timeout=remaining)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "batch_size": self.batch_size,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "draining": self._draining,
+        }
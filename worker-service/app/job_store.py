@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from app.metrics import timed
+
+logger = logging.getLogger("worker-service")
+
+# Job records live in one Redis hash per job (`job:{job_id}`) and expire JOB_TTL_SECONDS after
+# their last update. Every status change is also published on JOB_EVENTS_CHANNEL so waiters
+# in any worker replica wake up as soon as their job finishes.
+JOB_EVENTS_CHANNEL = os.getenv("JOB_EVENTS_CHANNEL", "job-events")
+TERMINAL_STATUSES = ("done", "failed")
+
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def decode_job(fields: Dict[str, str]) -> Optional[dict]:
+    if not fields:
+        return None
+    job = dict(fields)
+    if job.get("result"):
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+class JobStore:
+    def __init__(self, redis_client, ttl_seconds: int):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+
+    def _queue_update(self, pipe, job_id: str, fields: dict):
+        fields = {k: v for k, v in fields.items() if v is not None}
+        fields["updated_at"] = f"{time.time():.3f}"
+        pipe.hset(job_key(job_id), mapping=fields)
+        pipe.expire(job_key(job_id), self.ttl_seconds)
+        pipe.publish(JOB_EVENTS_CHANNEL, json.dumps({"job_id": job_id, "status": fields.get("status")}))
+
+    async def mark_queued_many(self, jobs: List[dict]):
+        pipe = self.redis.pipeline(transaction=False)
+        for job in jobs:
+            self._queue_update(pipe, job["job_id"], {
+                "job_id": job["job_id"],
+                "status": "queued",
+                "case_id": job.get("case_id"),
+                "userId1": job.get("userId1"),
+                "userId2": job.get("userId2"),
+                "preference": job.get("preference"),
+            })
+        with timed("redis", "job_queued"):
+            await pipe.execute()
+
+    async def mark_queued(self, job: dict):
+        await self.mark_queued_many([job])
+
+    async def mark(self, job_id: str, status: str, result=None, error: Optional[str] = None):
+        pipe = self.redis.pipeline(transaction=False)
+        self._queue_update(pipe, job_id, {
+            "status": status,
+            "result": json.dumps(result) if result is not None else None,
+            "error": error,
+        })
+        with timed("redis", "job_update"):
+            await pipe.execute()
+
+    async def mark_finished_many(self, outcomes: List[tuple]):
+        """
+        outcomes: [(job_id, result or Exception)] written in one pipeline.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for job_id, outcome in outcomes:
+            if isinstance(outcome, Exception):
+                self._queue_update(pipe, job_id, {"status": "failed", "error": str(outcome)})
+            else:
+                self._queue_update(pipe, job_id, {"status": "done", "result": json.dumps(outcome)})
+        with timed("redis", "job_update"):
+            await pipe.execute()
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        with timed("redis", "job_get"):
+            fields = await self.redis.hgetall(job_key(job_id))
+        return decode_job(fields)
+
+    async def get_many(self, job_ids: List[str]) -> Dict[str, Optional[dict]]:
+        pipe = self.redis.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hgetall(job_key(job_id))
+        with timed("redis", "job_get_many"):
+            rows = await pipe.execute()
+        return {job_id: decode_job(fields) for job_id, fields in zip(job_ids, rows)}
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """
+        Long-poll: returns the job once it reaches a terminal status or `timeout` expires.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, []).append(fut)
+        try:
+            # register before reading so a completion landing in between isn't missed
+            job = await self.get(job_id)
+            if job is None or job.get("status") in TERMINAL_STATUSES:
+                return job
+            try:
+                await asyncio.wait_for(fut, timeout)
+            except asyncio.TimeoutError:
+                pass
+            return await self.get(job_id)
+        finally:
+            waiters = self._waiters.get(job_id, [])
+            if fut in waiters:
+                waiters.remove(fut)
+            if not waiters:
+                self._waiters.pop(job_id, None)
+
+    def _wake(self, job_id: str):
+        for fut in self._waiters.get(job_id, []):
+            if not fut.done():
+                fut.set_result(None)
+
+    async def listen(self):
+        """
+        Background task: fans job events out to local long-poll waiters.
+        """
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(JOB_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    if event.get("status") in TERMINAL_STATUSES:
+                        self._wake(event.get("job_id"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"JOB EVENTS: listener failed err={e}")
+                # wake everyone so they re-read their job instead of sleeping through a lost event
+                for job_id in list(self._waiters):
+                    self._wake(job_id)
+                await asyncio.sleep(1)
@@ -0,0 +1,143 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app import tracing
+
+# Non-blocking logging: request handlers only put records on an in-memory queue, and a
+# QueueListener thread formats them (JSON lines) and does the file and console I/O. Records
+# keep their %-style args until the listener formats them, so a call like
+# logger.info("[%s] ...", case_id) costs the event loop one queue put.
+# The same module is copied into every service.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+# time-based rotation instead of size when set, e.g. "midnight" or "H" (TimedRotatingFileHandler)
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").lower() in ("1", "true", "yes")
+
+# attributes every LogRecord has; anything else came in through `extra=` and is kept as a field
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "case_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "case_id", None):
+            entry["case_id"] = record.case_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records unformatted and never blocks: when the listener falls behind and the
+    queue is full, the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the stock handler formats here, on the caller's thread; leave that to the listener
+        # and only capture what must be read now: the trace (Case-ID) of the current request
+        if not hasattr(record, "case_id"):
+            span = tracing.current_span()
+            record.case_id = span.trace_id if span is not None else None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLogSampler:
+    """
+    Decides whether a finished request gets a log line. Errors (status >= 400) and requests
+    slower than LOG_SLOW_MS are always kept; everything else is kept with its route's rate.
+
+    LOG_SAMPLE_RATE: default rate, 0..1
+    LOG_SAMPLE_ROUTES: per route template overrides, e.g. "/health=0,/metrics=0,/user-avail/batch=0.05"
+    """
+
+    def __init__(self, default_rate: float = 1.0, routes: Optional[Dict[str, float]] = None, slow_ms: float = 500.0):
+        self.default_rate = default_rate
+        self.routes = routes or {}
+        self.slow_ms = slow_ms
+
+    @classmethod
+    def from_env(cls) -> "RequestLogSampler":
+        routes = {}
+        for part in os.getenv("LOG_SAMPLE_ROUTES", "/health=0,/metrics=0").split(","):
+            route, _, rate = part.partition("=")
+            if route.strip() and rate.strip():
+                routes[route.strip()] = float(rate)
+        return cls(
+            default_rate=float(os.getenv("LOG_SAMPLE_RATE", 1.0)),
+            routes=routes,
+            slow_ms=float(os.getenv("LOG_SLOW_MS", 500)),
+        )
+
+    def keep(self, route: str, status_code: int, elapsed_ms: float) -> bool:
+        if status_code >= 400 or elapsed_ms >= self.slow_ms:
+            return True
+        rate = self.routes.get(route, self.default_rate)
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+def setup_logging(service: str, path: str, queue_size: int = LOG_QUEUE_SIZE) -> AsyncQueueHandler:
+    """
+    Routes the root logger through a bounded queue to a rotating JSON file (plus a plain
+    console stream when LOG_CONSOLE is on). Replaces any handlers basicConfig installed.
+    returns: the queue handler; its `dropped` count is worth exporting and `listener` drains the queue
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if LOG_ROTATE_WHEN:
+        file_handler = logging.handlers.TimedRotatingFileHandler(path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT)
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    file_handler.setFormatter(JsonFormatter(service))
+    handlers = [file_handler]
+    if LOG_CONSOLE:
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
+        handlers.append(console)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = AsyncQueueHandler(log_queue)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # drain whatever is still queued when the process exits (unless already stopped)
+    atexit.register(lambda: listener._thread is not None and listener.stop())
+    queue_handler.listener = listener
+    return queue_handler